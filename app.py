@@ -1,12 +1,21 @@
-import pickle
 import streamlit as st
-import requests
 import pandas as pd
 from PIL import Image
 import io
-import joblib
 import re
 
+from src.ann import load_ann_backend
+from src.autocomplete import MAX_SUGGESTIONS, load_autocomplete
+from src.catalog import load_movie_index
+from src.diversity import MMR_LAMBDA, MMR_POOL, diversify
+from src.filters import load_attribute_filters
+from src.neighbors import load_dense_similarity, load_neighbor_index
+from src.ranking import top_k
+from src.resources import load_pickle, load_joblib, resource_report
+from src.sparse_engine import load_sparse_engine
+from src.title_search import load_title_search
+from src.tmdb import fetch_many, local_movie_details, tmdb_available, upstream_stats
+
 # Page configuration
 st.set_page_config(
     page_title="PerfectPitch - Movie Recommender",
@@ -15,18 +24,45 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Load data globally
+# Load data globally (cached once per server process, shared across sessions and reruns)
 try:
-    movies = pickle.load(open('artifacts/movie_list.pkl', 'rb'))
-    similarity = pickle.load(open('artifacts/similarity.pkl', 'rb'))
+    movies = load_pickle('movie_list.pkl')
+    # Prefer the compact top-K neighbor index and the sparse tag engine; fall back to the dense matrix
+    # only when neither has been built. Dense and top-K data are memory-mapped so workers share one copy.
+    neighbor_index = load_neighbor_index()
+    sparse_engine = load_sparse_engine()
+    # Optional approximate search over the sparse engine, selected with PERFECTPITCH_ANN=lsh
+    ann_backend = load_ann_backend(sparse_engine)
+    similarity = None
+    if neighbor_index is None and sparse_engine is None:
+        similarity = load_dense_similarity()
+        if similarity is None:
+            similarity = load_pickle('similarity.pkl')
+    elif sparse_engine is None:
+        # A memory-mapped dense matrix, when converted, lets filtered and deep pages rank whole rows
+        similarity = load_dense_similarity()
     # Load the full movies data for detailed information
-    full_movies = pickle.load(open('artifacts/full_movies.pkl', 'rb'))
+    full_movies = load_pickle('full_movies.pkl')
     # Load sentiment analysis model and vectorizer
-    sentiment_model = joblib.load('artifacts/sentiment_model.pkl')
-    tfidf_vectorizer = joblib.load('artifacts/tfidf_vectorizer.pkl')
+    sentiment_model = load_joblib('sentiment_model.pkl')
+    tfidf_vectorizer = load_joblib('tfidf_vectorizer.pkl')
+    # Title/movie_id/row lookups, built once per process
+    movie_index = load_movie_index()
+    # Genre/decade/language bitsets for filtered recommendations
+    attribute_filters = load_attribute_filters()
+    # Typo-tolerant title lookups and prefix suggestions
+    title_search = load_title_search()
+    autocomplete = load_autocomplete()
 except Exception as e:
     st.error(f"Error loading data: {str(e)}")
     movies = None
+    movie_index = None
+    attribute_filters = None
+    title_search = None
+    autocomplete = None
+    neighbor_index = None
+    sparse_engine = None
+    ann_backend = None
     similarity = None
     full_movies = None
     sentiment_model = None
@@ -236,38 +272,23 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def fetch_movie_details(movie_id):
-    """Fetch detailed movie information including poster, rating, and overview"""
-    try:
-        url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key=8265bd1679663a7ea12ac168da84d2e8&language=en-US"
-        data = requests.get(url, timeout=10)
-        data = data.json()
-        
-        poster_path = data.get('poster_path')
-        if poster_path:
-            full_path = "https://image.tmdb.org/t/p/w500/" + poster_path
-        else:
-            full_path = None
-            
-        return {
-            'poster': full_path,
-            'rating': data.get('vote_average', 'N/A'),
-            'overview': data.get('overview', 'No description available.'),
-            'release_date': data.get('release_date', 'Unknown'),
-            'genres': [genre['name'] for genre in data.get('genres', [])]
-        }
-    except Exception as e:
-        st.error(f"Error fetching movie details: {str(e)}")
-        return None
+def fetch_card_details(rows):
+    """Fetch TMDB card details for catalog rows concurrently, falling back to local data per movie"""
+    fetched = fetch_many([movie_index.movie_id(row) for row in rows])
+    return [details if details is not None else local_movie_details(movie_index.details(row))
+            for row, details in zip(rows, fetched)]
 
-def get_selected_movie_details(selected_movie):
-    """Get detailed information about the selected movie from our dataset"""
+def get_selected_movie_details(row, tmdb_details=None):
+    """Get detailed information about the movie at catalog row `row` from our dataset"""
     try:
         # Find the movie in our dataset
-        movie_data = full_movies[full_movies['title'] == selected_movie].iloc[0]
+        movie_data = movie_index.details(row)
+        if movie_data is None:
+            raise KeyError(f"No details found for {movie_index.title(row)!r}")
         
-        # Get poster and additional details from TMDB API
-        tmdb_details = fetch_movie_details(movie_data['movie_id'])
+        # Get poster and additional details from TMDB API unless already fetched with the recommendations
+        if tmdb_details is None:
+            tmdb_details = fetch_card_details([row])[0]
         
         # Extract cast, crew, and overview from our dataset
         cast = movie_data['cast']
@@ -277,7 +298,7 @@ def get_selected_movie_details(selected_movie):
         production_companies = movie_data['production_companies']
         
         return {
-            'title': selected_movie,
+            'title': movie_index.title(row),
             'cast': cast,
             'crew': crew,
             'overview': overview,
@@ -289,35 +310,110 @@ def get_selected_movie_details(selected_movie):
         st.error(f"Error getting movie details: {str(e)}")
         return None
 
-def recommend(movie):
-    """Get movie recommendations with enhanced error handling"""
-    global movies, similarity
+def available(mask=None):
+    """`mask` narrowed to movies that have not been removed from the catalog, or None when nothing is ruled out
+
+    Removed movies keep their row with an empty tag vector, so every scoring path has to rule them out.
+    """
+    if movie_index is None or not movie_index.removed.any():
+        return mask
+    return ~movie_index.removed if mask is None else mask & ~movie_index.removed
+
+def similar_movies(index, k=5, offset=0, mask=None):
+    """Get (row, similarity score) pairs for `k` neighbors of catalog row `index` starting at rank `offset`
+
+    `mask` optionally restricts results to the rows where it is True.
+    """
+    global movie_index, similarity, neighbor_index, sparse_engine
     
-    if movies is None or similarity is None:
+    if movie_index is None or (similarity is None and neighbor_index is None and sparse_engine is None):
         st.error("Movie data not loaded. Please check your artifacts folder.")
         return []
     
     try:
-        index = movies[movies['title'] == movie].index[0]
-        distances = sorted(list(enumerate(similarity[index])), reverse=True, key=lambda x: x[1])
-        
-        recommended_movies = []
-        for i in distances[1:6]:
-            movie_id = movies.iloc[i[0]].movie_id
-            movie_title = movies.iloc[i[0]].title
-            movie_details = fetch_movie_details(movie_id)
-            
-            if movie_details:
-                recommended_movies.append({
-                    'title': movie_title,
-                    'details': movie_details,
-                    'similarity_score': distances[i[0]][1]
-                })
-        
-        return recommended_movies
+        # With the sparse engine, pages are re-ranked for variety (MMR) from a fixed pool of the closest movies
+        if sparse_engine is not None and MMR_LAMBDA < 1:
+            rows, scores = sparse_engine.similar(index, max(MMR_POOL, offset + k), backend=ann_backend,
+                                                 mask=available(mask))
+            return list(zip(*diversify(rows, scores, sparse_engine.matrix, k, offset)))
+        # The top-K index answers the first unfiltered pages; the sparse engine or the dense matrix can page
+        # arbitrarily deep and apply filters before selecting, so their filtered pages are full whenever enough
+        # movies match. Removals are already patched out of the top-K index
+        whole_rows = sparse_engine is not None or similarity is not None
+        if neighbor_index is not None and not whole_rows and mask is not None:
+            # Only the stored top-K can be filtered here, after selection
+            st.info("Filters only apply to each movie's closest stored matches, so there may be few results. "
+                    "Build the sparse engine (python -m src.build) to filter the whole catalog.")
+            rows, scores = neighbor_index.neighbors(index, neighbor_index.k)
+            return list(zip(rows[mask[rows]], scores[mask[rows]]))[offset:offset + k]
+        if neighbor_index is not None and mask is None and (offset + k <= neighbor_index.k or not whole_rows):
+            return list(zip(*neighbor_index.neighbors(index, k, offset)))
+        if sparse_engine is not None:
+            return list(zip(*sparse_engine.similar(index, k, offset, backend=ann_backend, mask=available(mask))))
+        return list(zip(*top_k(similarity[index], k, offset, exclude=index, mask=available(mask))))
+    except Exception as e:
+        st.error(f"Error getting recommendations: {str(e)}")
+        return []
+
+def build_recommendations(neighbors, details):
+    """Combine neighbor rows and scores with their fetched card details, keeping similarity order"""
+    return [{
+        'title': movie_index.title(row),
+        'details': movie_details,
+        'similarity_score': float(score)
+    } for (row, score), movie_details in zip(neighbors, details)]
+
+def recommend(row, k=5, offset=0, mask=None):
+    """Get `k` recommendations for the movie at catalog row `row` starting at rank `offset`"""
+    neighbors = similar_movies(row, k, offset, mask)
+    details = fetch_card_details([row for row, _ in neighbors])
+    return build_recommendations(neighbors, details)
+
+def recommend_many(rows, k=5, offset=0, weights=None, mask=None):
+    """Get `k` recommendations for the catalog rows of several liked movies at once, optionally weighted"""
+    if movie_index is None or sparse_engine is None:
+        st.error("Recommendations from several movies need the sparse engine. Please build it first.")
+        return []
+    
+    try:
+        rows, scores = sparse_engine.similar_to_many(rows, max(MMR_POOL, offset + k), weights=weights,
+                                                     backend=ann_backend, mask=available(mask))
+        neighbors = list(zip(*diversify(rows, scores, sparse_engine.matrix, k, offset)))
     except Exception as e:
         st.error(f"Error getting recommendations: {str(e)}")
         return []
+    details = fetch_card_details([row for row, _ in neighbors])
+    return build_recommendations(neighbors, details)
+
+def recommend_text(description, k=5, offset=0, mask=None):
+    """Get `k` movies matching a free-text description, ranked like title-based recommendations"""
+    if sparse_engine is None:
+        st.error("Describing a movie needs the sparse engine. Please build it first.")
+        return []
+    
+    try:
+        rows, scores = sparse_engine.search_text(description, max(MMR_POOL, offset + k), backend=ann_backend,
+                                                 mask=available(mask))
+        neighbors = list(zip(*diversify(rows, scores, sparse_engine.matrix, k, offset)))
+    except Exception as e:
+        st.error(f"Error searching movies: {str(e)}")
+        return []
+    details = fetch_card_details([row for row, _ in neighbors])
+    return build_recommendations(neighbors, details)
+
+def movie_suggestions(query, n=MAX_SUGGESTIONS):
+    """Rows of movies completing `query`, most popular first, topped up with typo-tolerant matches
+
+    Rows rather than titles are returned, so movies sharing a title stay separately selectable.
+    """
+    rows = autocomplete.suggest(query, n) if autocomplete is not None else []
+    if query and len(rows) < n and title_search is not None:
+        rows += [row for row, _ in title_search.search(query, n) if row not in rows][:n - len(rows)]
+    # The movie list repeats a few movies under several rows; offer each movie once
+    first_rows = {}
+    for row in rows:
+        first_rows.setdefault(movie_index.movie_id(row), row)
+    return list(first_rows.values())
 
 def analyze_sentiment(review_text):
     """Analyze the sentiment of a movie review"""
@@ -348,6 +444,18 @@ def analyze_sentiment(review_text):
     except Exception as e:
         return None, str(e)
 
+def resource_table():
+    """Load time and size of every artifact loaded by this server process, one row per artifact"""
+    def megabytes(value):
+        return round(value / 1e6, 1) if value is not None else None
+    
+    return pd.DataFrame([{
+        'Artifact': name,
+        'Load (s)': round(stats['load_seconds'], 3),
+        'Size (MB)': megabytes(stats['size_bytes']),
+        'RSS delta (MB)': megabytes(stats['rss_delta_bytes'])
+    } for name, stats in resource_report().items()])
+
 def display_rating_stars(rating):
     """Display rating as stars"""
     if rating == 'N/A':
@@ -369,10 +477,22 @@ def display_rating_stars(rating):
 
 def main():
     # Check if data is loaded
-    if movies is None or similarity is None or full_movies is None:
+    if movies is None or (similarity is None and neighbor_index is None and sparse_engine is None) or full_movies is None:
         st.error("Failed to load movie data. Please ensure the artifacts folder contains the required pickle files.")
         return
     
+    # Sidebar diagnostics: what each shared artifact cost this server process to load
+    with st.sidebar:
+        st.markdown("### ⚙️ System Status")
+        st.caption("Artifacts are loaded once per server process and shared by every session.")
+        st.dataframe(resource_table(), hide_index=True, use_container_width=True)
+        # TMDB traffic of this process: kept-alive connections reused and lookups that joined an in-flight call
+        upstream = upstream_stats()
+        st.markdown("**TMDB upstream**")
+        st.caption(f"{upstream['requests']} requests: {upstream['reused_connections']} on reused connections, "
+                   f"{upstream['new_connections']} new connections. {upstream['calls']} lookups sent, "
+                   f"{upstream['shared']} joined one already in flight.")
+    
     # Header with cinematic style
     st.markdown("""
     <div style='text-align: center; padding: 2rem 0;'>
@@ -399,26 +519,100 @@ def main():
     st.markdown('<h2 class="section-header"><i class="fas fa-clapperboard"></i> Movie Recommendations</h2>', unsafe_allow_html=True)
     st.markdown("Discover similar movies based on your favorites")
     
+    # Suggestions are looked up on the server for what was typed, so the page never carries the whole catalog
+    title_query = st.text_input(
+        "🔎 Search for a movie:",
+        key='title_query',
+        placeholder="Start typing a title, e.g. dark kn or harry poter",
+        help="Press Enter to see the most popular matching titles; small typos are forgiven"
+    )
+    movie_list = movie_suggestions(title_query)
+    if title_query and not movie_list:
+        st.info("No movie title looks like that. Try another spelling; here are some popular picks instead.")
+        movie_list = movie_suggestions('')
+    
     # Movie selection with improved styling
-    movie_list = movies['title'].values
-    selected_movie = st.selectbox(
+    selected_row = st.selectbox(
         "🎭 Choose a movie you love:",
         movie_list,
         index=0 if len(movie_list) > 0 else None,
-        help="Start typing to search through our movie database"
+        format_func=movie_index.label,
+        key='selected_movie',
+        help="The most popular titles matching your search"
     )
+    selected_movie = movie_index.title(selected_row) if selected_row is not None else None
+    
+    # Optional filters, applied while selecting recommendations rather than afterwards
+    filter_mask = None
+    if attribute_filters is not None:
+        with st.expander("🎛️ Filter recommendations"):
+            chosen_genres = st.multiselect("Genres:", attribute_filters.genres)
+            year_range = attribute_filters.year_range
+            chosen_years = st.slider("Released between:", *year_range, value=year_range) if year_range else None
+            chosen_languages = st.multiselect("Original language:", attribute_filters.languages) \
+                if attribute_filters.languages else []
+        year_from, year_to = chosen_years if chosen_years and chosen_years != year_range else (None, None)
+        filter_mask = attribute_filters.mask(chosen_genres, year_from, year_to, chosen_languages)
     
     # Get recommendations button
     if st.button('🎬 Get Movie Recommendations', key='recommend_btn', use_container_width=True):
         with st.spinner('Finding the perfect matches...'):
+            # Fetch the selected movie and its recommendations in one concurrent batch
+            neighbors = similar_movies(selected_row, mask=filter_mask)
+            details = fetch_card_details([selected_row] + [row for row, _ in neighbors])
             # Get selected movie details
-            selected_movie_details = get_selected_movie_details(selected_movie)
+            selected_movie_details = get_selected_movie_details(selected_row, tmdb_details=details[0])
             # Get recommendations
-            recommended_movies = recommend(selected_movie)
+            recommended_movies = build_recommendations(neighbors, details[1:])
             
             # Store in session state to preserve after other actions
             st.session_state.selected_movie_details = selected_movie_details
             st.session_state.recommended_movies = recommended_movies
+            # The seed row is kept on its own: the details above are None when the movie has no local record
+            st.session_state.seed_row = selected_row
+            st.session_state.recommendation_offset = 0
+            st.session_state.liked_movies = None
+            st.session_state.description = None
+    
+    # Recommendations for several favourites at once
+    if sparse_engine is not None:
+        with st.expander("❤️ More Like These: combine several favourites"):
+            # Already picked titles stay available while the search box offers new ones
+            liked_movies = st.multiselect(
+                "Pick the movies you love:",
+                list(dict.fromkeys(st.session_state.get('liked_movies_select', []) + movie_list)),
+                format_func=movie_index.label,
+                key='liked_movies_select',
+                help="Recommendations match the combined tags of every movie you pick; search above for more titles"
+            )
+            if st.button('🎬 Recommend From My Favourites', key='recommend_many_btn',
+                         use_container_width=True, disabled=not liked_movies):
+                with st.spinner('Finding the perfect matches...'):
+                    st.session_state.selected_movie_details = None
+                    st.session_state.recommended_movies = recommend_many(liked_movies, mask=filter_mask)
+                    st.session_state.seed_row = None
+                    st.session_state.recommendation_offset = 0
+                    st.session_state.liked_movies = liked_movies
+                    st.session_state.description = None
+        
+        # Free-text search over the same tags the recommendations use
+        with st.expander("📝 Describe a movie you'd like to watch"):
+            description = st.text_input(
+                "Describe it in a few words:",
+                key='description_query',
+                placeholder="e.g. space marines alien war"
+            )
+            if st.button('🔍 Find Matching Movies', key='describe_btn',
+                         use_container_width=True, disabled=not description.strip()):
+                with st.spinner('Finding the perfect matches...'):
+                    st.session_state.selected_movie_details = None
+                    st.session_state.recommended_movies = recommend_text(description, mask=filter_mask)
+                    st.session_state.seed_row = None
+                    st.session_state.recommendation_offset = 0
+                    st.session_state.liked_movies = None
+                    st.session_state.description = description
+                if not st.session_state.recommended_movies:
+                    st.info("None of those words appear in our movie tags. Try describing the plot, genre or cast.")
     
     # Display recommendations (will be preserved)
     if 'selected_movie_details' in st.session_state and st.session_state.selected_movie_details:
@@ -463,6 +657,8 @@ def main():
     if 'recommended_movies' in st.session_state and st.session_state.recommended_movies:
         st.markdown("---")
         st.markdown("### 🎯 Recommended Movies")
+        if not tmdb_available():
+            st.info("The Movie Database is unreachable right now, so some cards show details from our local catalog.")
         
         # Display recommendations in a grid with movie cards
         cols = st.columns(5)
@@ -494,7 +690,28 @@ def main():
                     genres_text = ", ".join(movie['details']['genres'][:2])
                     st.markdown(f"🏷️ {genres_text}")
                 
+                # Cast (only present on cards built from local data)
+                if movie['details'].get('cast'):
+                    st.markdown(f"👥 {', '.join(movie['details']['cast'][:2])}")
+                
                 st.markdown('</div>', unsafe_allow_html=True)
+        
+        # Page through further neighbors of the same movie, set of favourites or description
+        if st.button('🔄 Show More Like This', key='show_more_btn', use_container_width=True):
+            with st.spinner('Finding more matches...'):
+                next_offset = st.session_state.get('recommendation_offset', 0) + 5
+                if st.session_state.get('description'):
+                    more_movies = recommend_text(st.session_state.description, offset=next_offset, mask=filter_mask)
+                elif st.session_state.get('liked_movies'):
+                    more_movies = recommend_many(st.session_state.liked_movies, offset=next_offset, mask=filter_mask)
+                else:
+                    more_movies = recommend(st.session_state.seed_row, offset=next_offset, mask=filter_mask)
+            if more_movies:
+                st.session_state.recommended_movies = more_movies
+                st.session_state.recommendation_offset = next_offset
+                st.rerun()
+            else:
+                st.info("No more recommendations for this movie.")
     
     # Section 2: Review This Movie
     st.markdown("---")
@@ -0,0 +1,113 @@
+"""Server-side prefix autocomplete over movie titles.
+
+Instead of sending every title to the browser, the app asks this index for
+the few titles that complete what the user typed. Every word-start suffix of
+every normalised title ("the dark knight", "dark knight", "knight") is kept
+in one sorted array, so the titles completing a prefix form a contiguous
+range found with two binary searches, whichever word the user starts with.
+
+Suggestions are ranked by TMDB popularity, read from a ``popularity`` column
+of ``full_movies`` when present and otherwise from the prefetched metadata
+store, then by catalog order (the Kaggle catalog is ordered by budget, a
+reasonable stand-in when popularity is unknown). Answers for prefixes of up
+to ``PRECOMPUTED_PREFIX`` characters, whose ranges can span much of the
+catalog, are precomputed; longer prefixes only rank their own short range.
+"""
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from src.catalog import load_movie_index
+from src.metadata_store import load_metadata_store
+from src.resources import get_resource
+from src.title_search import normalize_title
+
+MAX_SUGGESTIONS = 10
+PRECOMPUTED_PREFIX = 3
+# Sorts after every character that can appear in a normalised title
+END = '\uffff'
+
+
+class Autocomplete:
+    """Sorted word-start suffixes of titles answering top-N prefix completions"""
+
+    def __init__(self, titles, popularity, rows=None, max_suggestions=MAX_SUGGESTIONS):
+        self.titles = list(titles)
+        self.rows = np.arange(len(self.titles)) if rows is None else np.asarray(rows)
+        self.max_suggestions = max_suggestions
+        # Rank 0 is the most popular title; catalog order breaks ties
+        order = np.lexsort((np.arange(len(self.titles)), -np.asarray(popularity, dtype=np.float64)))
+        self._rank = np.empty(len(self.titles), dtype=np.int64)
+        self._rank[order] = np.arange(len(self.titles))
+
+        entries = []
+        for position, title in enumerate(self.titles):
+            words = normalize_title(title).split()
+            entries.extend((' '.join(words[start:]), position) for start in range(len(words)))
+        entries.sort()
+        self._keys = [key for key, _ in entries]
+        self._positions = np.asarray([position for _, position in entries], dtype=np.int64)
+        self._popular = order[:max_suggestions]
+
+        self._precomputed = {}
+        for length in range(1, PRECOMPUTED_PREFIX + 1):
+            start = 0
+            while start < len(self._keys):
+                prefix = self._keys[start][:length]
+                if len(prefix) < length:
+                    # Keys shorter than the prefix length sort first; step over them
+                    start = bisect_right(self._keys, prefix, start)
+                    continue
+                stop = bisect_left(self._keys, prefix + END, start)
+                self._precomputed[prefix] = self._best(self._positions[start:stop])
+                start = stop
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _best(self, positions):
+        """The most popular `max_suggestions` distinct title positions, most popular first"""
+        positions = np.unique(positions)
+        ranks = self._rank[positions]
+        if positions.size > self.max_suggestions:
+            keep = np.argpartition(ranks, self.max_suggestions - 1)[:self.max_suggestions]
+            positions, ranks = positions[keep], ranks[keep]
+        return positions[np.argsort(ranks)]
+
+    def suggest(self, prefix, n=MAX_SUGGESTIONS):
+        """Rows of up to `n` titles with a word starting with `prefix`, most popular first
+
+        An empty prefix returns the most popular titles. `n` is capped at `max_suggestions`.
+        """
+        key = normalize_title(prefix)
+        if not key:
+            positions = self._popular
+        elif key in self._precomputed:
+            positions = self._precomputed[key]
+        elif len(key) <= PRECOMPUTED_PREFIX:
+            positions = self._positions[:0]
+        else:
+            start = bisect_left(self._keys, key)
+            stop = bisect_left(self._keys, key + END, start)
+            positions = self._best(self._positions[start:stop])
+        return [int(row) for row in self.rows[positions[:n]]]
+
+
+def _popularity(details, fetched):
+    if details is not None and 'popularity' in details:
+        return details['popularity'] or 0
+    return fetched.get('popularity') or 0
+
+
+def build_autocomplete(movie_index, metadata=None):
+    """Autocomplete over the movies that have not been removed, ranked by known popularity"""
+    metadata = metadata or {}
+    rows = np.flatnonzero(~movie_index.removed)
+    popularity = [_popularity(movie_index.details(row), metadata.get(movie_index.movie_id(row)) or {})
+                  for row in rows]
+    return Autocomplete([movie_index.title(row) for row in rows], popularity, rows)
+
+
+def load_autocomplete():
+    """Build the autocomplete index once per process"""
+    return get_resource('autocomplete', lambda: build_autocomplete(load_movie_index(), load_metadata_store()))
@@ -0,0 +1,104 @@
+"""Batch recommendations for offline jobs.
+
+Neighbors for thousands of seeds are read in one gather from the top-K
+neighbor index, or computed with one sparse matrix product per chunk of
+seeds when more neighbors are needed than the index stores. Nothing here
+touches Streamlit or the network.
+
+Example::
+
+    from src.batch import load_batch_recommender
+    frame = load_batch_recommender().recommend(['Avatar', 'Titanic', 19995], k=10)
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.catalog import load_movie_index
+from src.neighbors import load_neighbor_index
+from src.ranking import top_k_rows
+from src.sparse_engine import load_sparse_engine
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 1024
+
+
+class BatchRecommender:
+    """Neighbors for many seed titles or movie ids at once"""
+
+    def __init__(self, movie_index, neighbor_index=None, engine=None, chunk_rows=CHUNK_ROWS):
+        if neighbor_index is None and engine is None:
+            raise ValueError("BatchRecommender needs a neighbor index or a sparse engine")
+        self.movie_index = movie_index
+        self.neighbor_index = neighbor_index
+        self.engine = engine
+        self.chunk_rows = chunk_rows
+
+    def resolve(self, seeds, errors='ignore'):
+        """Catalog rows for seeds given as titles or TMDB movie ids, with the seeds that resolved
+
+        Unknown seeds are logged and skipped, or raise KeyError when `errors` is 'raise'.
+        """
+        rows = []
+        found = []
+        missing = []
+        for seed in seeds:
+            try:
+                if isinstance(seed, str):
+                    rows.append(self.movie_index.row_for_title(seed))
+                else:
+                    rows.append(self.movie_index.row_for_movie_id(seed))
+                found.append(seed)
+            except KeyError:
+                missing.append(seed)
+        if missing:
+            if errors == 'raise':
+                raise KeyError(f"Unknown seeds: {missing!r}")
+            logger.warning("Skipping %d unknown seeds, e.g. %r", len(missing), missing[:5])
+        return np.asarray(rows, dtype=np.int64), found
+
+    def neighbor_rows(self, rows, k=5):
+        """(ids, scores) arrays of shape (len(rows), k) with each row's neighbors, best first"""
+        if self.neighbor_index is not None and (k <= self.neighbor_index.k or self.engine is None):
+            k = min(k, self.neighbor_index.k)
+            return (np.asarray(self.neighbor_index.ids[rows, :k]),
+                    np.asarray(self.neighbor_index.scores[rows, :k], dtype=np.float32))
+
+        matrix = self.engine.matrix
+        # A seed has at most one neighbor per other movie still in the catalog
+        k = max(0, min(k, int(np.count_nonzero(~self.movie_index.removed)) - 1))
+        ids = np.empty((len(rows), k), dtype=np.int32)
+        scores = np.empty((len(rows), k), dtype=np.float32)
+        for start in range(0, len(rows), self.chunk_rows):
+            chunk = rows[start:start + self.chunk_rows]
+            chunk_scores = (matrix[chunk] @ matrix.T).toarray()
+            chunk_scores[:, self.movie_index.removed] = -np.inf
+            ids[start:start + len(chunk)], scores[start:start + len(chunk)] = top_k_rows(chunk_scores, k,
+                                                                                         exclude=chunk)
+        return ids, scores
+
+    def recommend(self, seeds, k=5, errors='ignore'):
+        """One DataFrame row per (seed, neighbor) with the neighbor's rank, movie_id, title and score"""
+        rows, found = self.resolve(seeds, errors)
+        if len(rows) == 0:
+            return pd.DataFrame(columns=['seed', 'seed_movie_id', 'rank', 'movie_id', 'title', 'score'])
+        ids, scores = self.neighbor_rows(rows, k)
+        n_seeds, n_neighbors = ids.shape
+        flat_ids = ids.ravel()
+        frame = pd.DataFrame({
+            'seed': np.repeat(np.asarray(found, dtype=object), n_neighbors),
+            'seed_movie_id': np.repeat(self.movie_index.row_to_movie_id[rows], n_neighbors),
+            'rank': np.tile(np.arange(1, n_neighbors + 1), n_seeds),
+            'movie_id': self.movie_index.row_to_movie_id[flat_ids],
+            'title': np.asarray(self.movie_index.titles, dtype=object)[flat_ids],
+            'score': scores.ravel(),
+        })
+        # Rows with fewer stored neighbors than k are padded with id -1
+        return frame[flat_ids >= 0].reset_index(drop=True)
+
+
+def load_batch_recommender():
+    """Batch recommender over the artifacts folder, sharing the process-wide loaded artifacts"""
+    return BatchRecommender(load_movie_index(), load_neighbor_index(), load_sparse_engine())
@@ -0,0 +1,199 @@
+"""Bounded-memory build of the recommendation artifacts.
+
+The notebook materialises the dense count matrix and the full N x N
+similarity matrix at once. This build fits the tag vectorizer into a sparse
+matrix (``src.sparse_engine``), then computes similarity one block of rows at
+a time and keeps only each row's top-K before moving on. Blocks are streamed
+straight into the memory-mapped neighbor index, so peak memory is set by the
+budget rather than by N squared, and the result matches the exact dense
+computation (including the lower-row tie-break of ``src.ranking``).
+
+With ``--workers`` above one the rows are split into shards and computed on
+a process pool. The feature matrix is written once as memory-mapped arrays
+that every worker maps read-only, and each worker writes its shard's rows
+straight into the shared output files. Every row's top-K depends only on
+that row, so the merged result is identical to a single-process build
+whatever order the shards finish in.
+
+Usage::
+
+    python -m src.build --k 50 --memory-budget 2GB --workers 8
+"""
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.mmap_store import commit_array, create_array, open_array, save_array
+from src.neighbors import DEFAULT_K, MAX_K, NEIGHBORS_DIR, SCORE_DTYPES
+from src.ranking import top_k_rows
+from src.resources import artifact_path, load_pickle
+from src.sparse_engine import MAX_FEATURES, SPARSE_DIR, SparseEngine, fit_tag_counts, normalized_features
+
+DEFAULT_MEMORY_BUDGET = 2 * 1024 ** 3
+# Per score at the peak, inside top_k_rows: the dense float64 block, its rounded copy, the negated copy that
+# argpartition reads and argpartition's int64 index array (the sparse product, 12 bytes, is freed before then)
+BYTES_PER_SCORE = 8 + 8 + 8 + 8
+UNITS = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+def parse_size(text):
+    """Parse a memory size such as '2GB', '512MB' or a plain byte count"""
+    text = text.strip().upper()
+    for unit, factor in UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def block_rows_for_budget(n_rows, memory_budget):
+    """Number of query rows whose scores against every movie fit in `memory_budget` bytes"""
+    return max(1, min(n_rows, memory_budget // (n_rows * BYTES_PER_SCORE)))
+
+
+def neighbor_block(matrix, start, stop, k):
+    """Exact top-`k` neighbors of rows `start` to `stop` of a normalised feature matrix"""
+    scores = matrix[start:stop] @ matrix.T
+    scores = scores.toarray() if hasattr(scores, 'toarray') else np.asarray(scores)
+    return top_k_rows(scores, k, exclude=np.arange(start, stop))
+
+
+def build_neighbors_blocked(matrix, output_dir, k=DEFAULT_K, score_dtype='float16',
+                            memory_budget=DEFAULT_MEMORY_BUDGET, progress=None):
+    """Stream the top-`k` neighbors of every row of `matrix` into `output_dir` block by block"""
+    n = matrix.shape[0]
+    if not 0 < k < n:
+        raise ValueError(f"k must be between 1 and {n - 1}, got {k}")
+    block_rows = block_rows_for_budget(n, memory_budget)
+
+    ids_path = os.path.join(output_dir, 'ids.npy')
+    scores_path = os.path.join(output_dir, 'scores.npy')
+    ids = create_array(ids_path, (n, k), np.int32)
+    scores = create_array(scores_path, (n, k), score_dtype)
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        ids[start:stop], scores[start:stop] = neighbor_block(matrix, start, stop, k)
+        if progress is not None:
+            progress(stop, n)
+    commit_array(ids, ids_path)
+    commit_array(scores, scores_path)
+    return block_rows
+
+
+_worker = {}
+
+
+def _init_worker(features_dir, shape, ids_path, scores_path, k):
+    """Map the shared features and output arrays once per worker process"""
+    parts = [open_array(os.path.join(features_dir, f"{name}.npy")) for name in ('data', 'indices', 'indptr')]
+    _worker['matrix'] = sp.csr_matrix(tuple(parts), shape=shape, copy=False)
+    _worker['ids'] = open_array(ids_path, writable=True)
+    _worker['scores'] = open_array(scores_path, writable=True)
+    _worker['k'] = k
+
+
+def _build_shard(bounds):
+    start, stop = bounds
+    began = time.perf_counter()
+    ids, scores = neighbor_block(_worker['matrix'], start, stop, _worker['k'])
+    _worker['ids'][start:stop] = ids
+    _worker['scores'][start:stop] = scores
+    _worker['ids'].flush()
+    _worker['scores'].flush()
+    return os.getpid(), stop - start, time.perf_counter() - began
+
+
+def build_neighbors_parallel(matrix, output_dir, k=DEFAULT_K, score_dtype='float16',
+                             memory_budget=DEFAULT_MEMORY_BUDGET, workers=None, progress=None):
+    """Like `build_neighbors_blocked`, with row shards spread over `workers` processes
+
+    `memory_budget` is shared by all workers. Returns rows per second for each worker process.
+    """
+    workers = workers or os.cpu_count() or 1
+    n = matrix.shape[0]
+    if not 0 < k < n:
+        raise ValueError(f"k must be between 1 and {n - 1}, got {k}")
+    matrix = sp.csr_matrix(matrix)
+    # Several shards per worker keep every core busy even when the budget would allow huge blocks
+    block_rows = min(block_rows_for_budget(n, memory_budget // workers), -(-n // (workers * 4)))
+    shards = [(start, min(start + block_rows, n)) for start in range(0, n, block_rows)]
+
+    features_dir = os.path.join(output_dir, '.features')
+    for name in ('data', 'indices', 'indptr'):
+        save_array(os.path.join(features_dir, f"{name}.npy"), getattr(matrix, name))
+    ids_path = os.path.join(output_dir, 'ids.npy')
+    scores_path = os.path.join(output_dir, 'scores.npy')
+    ids = create_array(ids_path, (n, k), np.int32)
+    scores = create_array(scores_path, (n, k), score_dtype)
+    ids.flush()
+    scores.flush()
+
+    busy = {}
+    done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(features_dir, matrix.shape, ids.filename, scores.filename, k)) as pool:
+            for pid, rows, seconds in pool.map(_build_shard, shards):
+                worker_rows, worker_seconds = busy.get(pid, (0, 0.0))
+                busy[pid] = (worker_rows + rows, worker_seconds + seconds)
+                done += rows
+                if progress is not None:
+                    progress(done, n)
+    finally:
+        shutil.rmtree(features_dir, ignore_errors=True)
+
+    # Reopen so the parent's view reflects what the workers wrote before moving the files into place
+    commit_array(open_array(ids.filename, writable=True), ids_path)
+    commit_array(open_array(scores.filename, writable=True), scores_path)
+    return {pid: rows / seconds if seconds else float('inf') for pid, (rows, seconds) in busy.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the sparse engine and top-K neighbor index in bounded memory")
+    parser.add_argument('--movies', default='movie_list.pkl', help="catalog artifact inside the artifacts folder")
+    parser.add_argument('--k', type=int, default=DEFAULT_K)
+    parser.add_argument('--dtype', choices=SCORE_DTYPES, default='float16')
+    parser.add_argument('--max-features', type=int, default=MAX_FEATURES)
+    parser.add_argument('--memory-budget', type=parse_size, default=DEFAULT_MEMORY_BUDGET,
+                        help="memory for the blocks of scores in flight, e.g. 2GB or 512MB")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="worker processes for the neighbor build (0 for one per CPU core)")
+    args = parser.parse_args(argv)
+
+    if not 0 < args.k <= MAX_K:
+        parser.error(f"--k must be between 1 and {MAX_K}")
+
+    start = time.perf_counter()
+    vectorizer, counts = fit_tag_counts(load_pickle(args.movies)['tags'], max_features=args.max_features)
+    SparseEngine(vectorizer, normalized_features(counts)).save(artifact_path(SPARSE_DIR))
+    print(f"Fitted vectorizer: {counts.shape[0]} movies x {counts.shape[1]} terms "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    def progress(done, total):
+        print(f"\r{done}/{total} rows", end='', flush=True)
+
+    start = time.perf_counter()
+    # Neighbors are ranked on float64 features so they match the dense float64 computation
+    features = normalized_features(counts, np.float64)
+    if args.workers == 1:
+        block_rows = build_neighbors_blocked(features, artifact_path(NEIGHBORS_DIR), k=args.k, score_dtype=args.dtype,
+                                             memory_budget=args.memory_budget, progress=progress)
+        print(f"\nWrote top-{args.k} neighbors to {artifact_path(NEIGHBORS_DIR)} in {time.perf_counter() - start:.1f}s "
+              f"({block_rows} rows per block)")
+        return
+
+    rates = build_neighbors_parallel(features, artifact_path(NEIGHBORS_DIR), k=args.k, score_dtype=args.dtype,
+                                     memory_budget=args.memory_budget, workers=args.workers or None,
+                                     progress=progress)
+    print(f"\nWrote top-{args.k} neighbors to {artifact_path(NEIGHBORS_DIR)} in {time.perf_counter() - start:.1f}s "
+          f"with {len(rates)} workers")
+    for pid, rate in sorted(rates.items()):
+        print(f"  worker {pid}: {rate:,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
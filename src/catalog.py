@@ -0,0 +1,101 @@
+"""Constant-time lookups between titles, TMDB movie ids and matrix rows.
+
+Rows are positions in ``movie_list.pkl``, which are also the row/column
+positions of the similarity matrix and the neighbor index. Titles are not
+unique in the TMDB 5000 dataset; ``row_for_title`` resolves a duplicate to its
+first row, matching the previous ``.index[0]`` behaviour, and every row of a
+duplicated title is still reachable through ``rows_for_title``. ``label``
+tells duplicates apart for display by their TMDB id.
+
+Movies tombstoned by ``src.incremental`` keep their row but are left out of
+the title and movie_id maps and of ``active_titles``.
+"""
+import logging
+
+import numpy as np
+
+from src.resources import get_resource, load_pickle
+
+logger = logging.getLogger(__name__)
+
+
+class MovieIndex:
+    """Prebuilt title/movie_id/row maps over the movie list and the full movie details"""
+
+    def __init__(self, movies, full_movies=None):
+        self.movies = movies
+        self.full_movies = full_movies
+        self.titles = movies['title'].tolist()
+        self.row_to_movie_id = movies['movie_id'].to_numpy()
+        removed = movies['removed'].tolist() if 'removed' in movies.columns else [False] * len(movies)
+        self.removed = np.asarray(removed, dtype=bool)
+        self.active_titles = [title for title, is_removed in zip(self.titles, removed) if not is_removed]
+
+        self._title_rows = {}
+        self._movie_id_rows = {}
+        for row, (title, movie_id, is_removed) in enumerate(zip(self.titles, self.row_to_movie_id.tolist(), removed)):
+            if is_removed:
+                continue
+            self._title_rows.setdefault(title, []).append(row)
+            self._movie_id_rows.setdefault(movie_id, row)
+
+        self._details_rows = {}
+        if full_movies is not None:
+            for row, movie_id in enumerate(full_movies['movie_id'].tolist()):
+                self._details_rows.setdefault(movie_id, row)
+
+        self.duplicate_titles = {title: rows for title, rows in self._title_rows.items() if len(rows) > 1}
+        if self.duplicate_titles:
+            logger.warning("%d titles appear more than once in the movie list; lookups by title use the first row",
+                           len(self.duplicate_titles))
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __contains__(self, title):
+        return title in self._title_rows
+
+    def rows_for_title(self, title):
+        """Every row whose title is `title`, in catalog order"""
+        return list(self._title_rows.get(title, []))
+
+    def row_for_title(self, title):
+        """First row whose title is `title`; raises KeyError for unknown titles"""
+        try:
+            return self._title_rows[title][0]
+        except KeyError:
+            raise KeyError(f"Movie not found: {title!r}") from None
+
+    def row_for_movie_id(self, movie_id):
+        """Row of the movie with TMDB id `movie_id`; raises KeyError for unknown ids"""
+        try:
+            return self._movie_id_rows[movie_id]
+        except KeyError:
+            raise KeyError(f"Movie id not found: {movie_id!r}") from None
+
+    def movie_id(self, row):
+        return self.row_to_movie_id[row].item()
+
+    def title(self, row):
+        return self.titles[row]
+
+    def label(self, row):
+        """Title of `row` for display, with its TMDB id when other movies share the title"""
+        title = self.titles[row]
+        if title in self.duplicate_titles:
+            return f"{title} (TMDB {self.movie_id(row)})"
+        return title
+
+    def details(self, row):
+        """Row of `full_movies` describing catalog row `row`, or None when it has no details"""
+        if self.full_movies is None:
+            return None
+        details_row = self._details_rows.get(self.movie_id(row))
+        if details_row is None:
+            return None
+        return self.full_movies.iloc[details_row]
+
+
+def load_movie_index():
+    """Build the movie index once per process from the movie list and full movie details"""
+    return get_resource('movie_index', lambda: MovieIndex(load_pickle('movie_list.pkl'), load_pickle('full_movies.pkl')))
@@ -0,0 +1,73 @@
+"""Circuit breaker for an unreliable upstream service.
+
+After `failure_threshold` consecutive failures the circuit opens and calls
+fail fast instead of waiting for timeouts. While open, a background thread
+runs the `probe` callable every `recovery_timeout` seconds and closes the
+circuit as soon as a probe succeeds. Without a probe, the first call after
+`recovery_timeout` is let through as a trial instead.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+
+
+class CircuitBreaker:
+    """Count consecutive failures and fail fast once they reach a threshold"""
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30, probe=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.probe = probe
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.state == OPEN
+
+    def allow(self):
+        """True when a call may go upstream"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.probe is None and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                # Let one trial call through; another failure re-opens the circuit for a full timeout
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state == OPEN:
+                logger.info("Circuit %s closed", self.name)
+            self.state = CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == OPEN or self._failures < self.failure_threshold:
+                return
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+        logger.warning("Circuit %s opened after %d consecutive failures", self.name, self.failure_threshold)
+        if self.probe is not None:
+            threading.Thread(target=self._probe_until_recovered, name=f"{self.name}-probe", daemon=True).start()
+
+    def _probe_until_recovered(self):
+        while self.is_open:
+            time.sleep(self.recovery_timeout)
+            try:
+                self.probe()
+            except Exception as e:
+                logger.info("Circuit %s probe failed: %s", self.name, e)
+                continue
+            self.record_success()
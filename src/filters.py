@@ -0,0 +1,150 @@
+"""Precomputed attribute bitsets for filtered recommendations.
+
+Every genre, release decade and original language gets a packed bitset over
+the catalog rows, built once per process. A filter such as "Animation or
+Family, released 2005 or later, in English" is a handful of bitwise
+operations that produce one boolean row mask; ``src.ranking.top_k`` rules
+out the masked rows before selecting, so a filtered query costs about the
+same as an unfiltered one and still returns K results whenever K movies
+match.
+
+Genres come from ``full_movies``. ``full_movies`` has no release date or
+language, so years and languages are read from ``release_date`` and
+``original_language`` columns when present, and otherwise from the
+prefetched metadata store (``python -m src.prefetch``). Movies whose year or
+language is unknown never match a year or language filter.
+"""
+import re
+
+import numpy as np
+
+from src.catalog import load_movie_index
+from src.metadata_store import load_metadata_store
+from src.resources import get_resource
+
+YEAR_BUCKET = 10
+
+
+def _genre_key(genre):
+    # full_movies may hold genres with spaces removed ("ScienceFiction"), TMDB returns "Science Fiction"
+    return re.sub(r'\s+', '', str(genre)).lower()
+
+
+def _year(release_date):
+    match = re.match(r'(\d{4})', str(release_date or ''))
+    return int(match.group(1)) if match else 0
+
+
+class AttributeFilters:
+    """Packed per-value bitsets over catalog rows for genres, release decades and languages"""
+
+    def __init__(self, genres, years, languages):
+        """`genres` and `languages` hold one list or value per row; `years` holds ints, 0 when unknown"""
+        self.n_rows = len(years)
+        self.years = np.asarray(years, dtype=np.int16)
+        self.genre_labels = {}
+        genre_rows = {}
+        for row, row_genres in enumerate(genres):
+            for genre in row_genres or ():
+                key = _genre_key(genre)
+                self.genre_labels.setdefault(key, genre)
+                genre_rows.setdefault(key, []).append(row)
+        language_rows = {}
+        for row, language in enumerate(languages):
+            if language:
+                language_rows.setdefault(language, []).append(row)
+
+        self._genres = {key: self._bitset(rows) for key, rows in genre_rows.items()}
+        self._languages = {language: self._bitset(rows) for language, rows in language_rows.items()}
+        known = self.years > 0
+        self._decades = {int(decade): np.packbits(known & (self.years // YEAR_BUCKET * YEAR_BUCKET == decade))
+                         for decade in np.unique(self.years[known] // YEAR_BUCKET * YEAR_BUCKET)}
+
+    def _bitset(self, rows):
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    @property
+    def genres(self):
+        return sorted(self.genre_labels.values())
+
+    @property
+    def languages(self):
+        return sorted(self._languages)
+
+    @property
+    def year_range(self):
+        """(first, last) known release year, or None when no year is known"""
+        known = self.years[self.years > 0]
+        return (int(known.min()), int(known.max())) if known.size else None
+
+    def _any_of(self, bitsets):
+        bits = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        for bitset in bitsets:
+            bits |= bitset
+        return bits
+
+    def _year_bits(self, year_from, year_to):
+        year_from = year_from or 1
+        year_to = year_to or np.iinfo(np.int16).max
+        bits = self._any_of(())
+        for decade, decade_bits in self._decades.items():
+            last = decade + YEAR_BUCKET - 1
+            if last < year_from or decade > year_to:
+                continue
+            if decade >= year_from and last <= year_to:
+                bits |= decade_bits
+                continue
+            # Decades cut by the range are resolved row by row, which only touches their movies
+            rows = np.flatnonzero(np.unpackbits(decade_bits, count=self.n_rows))
+            rows = rows[(self.years[rows] >= year_from) & (self.years[rows] <= year_to)]
+            bits |= self._bitset(rows)
+        return bits
+
+    def mask(self, genres=None, year_from=None, year_to=None, languages=None):
+        """Boolean row mask of movies matching any of `genres`, released in [`year_from`, `year_to`]
+        and in any of `languages`; None when no filter is given
+
+        Values within one attribute are OR-ed, attributes are AND-ed. Unknown genres or languages match nothing.
+        """
+        bits = None
+        if genres:
+            bits = self._any_of(self._genres.get(_genre_key(genre), 0) for genre in genres)
+        if year_from or year_to:
+            year_bits = self._year_bits(year_from, year_to)
+            bits = year_bits if bits is None else bits & year_bits
+        if languages:
+            language_bits = self._any_of(self._languages.get(language, 0) for language in languages)
+            bits = language_bits if bits is None else bits & language_bits
+        if bits is None:
+            return None
+        return np.unpackbits(bits, count=self.n_rows).view(bool)
+
+
+def build_attribute_filters(movie_index, metadata=None):
+    """Attribute bitsets for every catalog row from full_movies, filling gaps from prefetched `metadata`"""
+    metadata = metadata or {}
+    genres, years, languages = [], [], []
+    for row in range(len(movie_index)):
+        details = movie_index.details(row)
+        fetched = metadata.get(movie_index.movie_id(row)) or {}
+        if details is not None and 'genres' in details:
+            genres.append(list(details['genres']))
+        else:
+            genres.append(fetched.get('genres', []))
+        if details is not None and 'release_date' in details:
+            years.append(_year(details['release_date']))
+        else:
+            years.append(_year(fetched.get('release_date')))
+        if details is not None and 'original_language' in details:
+            languages.append(details['original_language'])
+        else:
+            languages.append(fetched.get('original_language'))
+    return AttributeFilters(genres, years, languages)
+
+
+def load_attribute_filters():
+    """Build the attribute bitsets once per process"""
+    return get_resource('attribute_filters',
+                        lambda: build_attribute_filters(load_movie_index(), load_metadata_store()))
@@ -0,0 +1,183 @@
+"""Incremental catalog updates without a full similarity rebuild.
+
+Adding or changing one movie only needs that movie's tag vector, built with
+the persisted vocabulary, and one sparse product against the catalog:
+
+* the movie's own neighbor row is computed exactly;
+* every other row whose K-th score it beats gets it merged into its list;
+* rows that listed the movie before an update or removal are re-ranked
+  exactly, since their (K+1)-th neighbor is not stored.
+
+Removal is a tombstone: the movie keeps its row, so every stored row id stays
+valid, but its tags are cleared, it is marked ``removed`` in the movie
+list and it never appears in a neighbor list again.
+
+Changes are made on in-memory copies and written back with ``save``, which
+replaces each artifact file atomically. Serving processes memory-map those
+files, so patching them in place could expose half-written rows; they pick
+up the new files on their next restart. Tags must be preprocessed like the
+``tags`` column of ``movie_list.pkl`` (lower-cased and Porter-stemmed).
+
+With float32 scores (``src.build --dtype float32``) the patched index is
+identical to a full rebuild; float16 scores can order near-ties differently.
+"""
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from src.mmap_store import save_array
+from src.neighbors import NEIGHBORS_DIR, NeighborIndex
+from src.ranking import TIE_DECIMALS, top_k_rows
+from src.resources import artifact_path
+from src.sparse_engine import SPARSE_DIR, SparseEngine, normalized_features
+
+
+def _save_pickle(obj, path):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(obj, f)
+    os.replace(tmp_path, path)
+
+
+class CatalogUpdater:
+    """Add, update and remove movies, patching only the affected neighbor rows"""
+
+    def __init__(self, movies, engine, neighbors, full_movies=None):
+        self.movies = movies.copy()
+        if 'removed' not in self.movies.columns:
+            self.movies['removed'] = False
+        self.full_movies = full_movies.copy() if full_movies is not None else None
+        self.engine = engine
+        # Re-vectorise once in float64 so patched rows rank exactly like a full `src.build` run
+        self.matrix = normalized_features(engine.vectorizer.transform(self.movies['tags']), np.float64)
+        self.ids = np.array(neighbors.ids)
+        self.scores = np.array(neighbors.scores)
+        self.k = self.ids.shape[1]
+
+    @classmethod
+    def load(cls):
+        """Updater over the artifacts folder, with every array copied into memory"""
+        with open(artifact_path('movie_list.pkl'), 'rb') as f:
+            movies = pickle.load(f)
+        full_movies = None
+        if os.path.exists(artifact_path('full_movies.pkl')):
+            with open(artifact_path('full_movies.pkl'), 'rb') as f:
+                full_movies = pickle.load(f)
+        return cls(movies, SparseEngine.load(artifact_path(SPARSE_DIR)),
+                   NeighborIndex.load(artifact_path(NEIGHBORS_DIR)), full_movies)
+
+    def _row(self, movie_id):
+        rows = np.flatnonzero((self.movies['movie_id'].to_numpy() == movie_id) & ~self.movies['removed'].to_numpy())
+        if rows.size == 0:
+            raise KeyError(f"Movie id not found: {movie_id!r}")
+        return int(rows[0])
+
+    def _vectorize(self, tags):
+        return normalized_features(self.engine.vectorizer.transform([tags.lower()]), np.float64)
+
+    def _set_vector(self, row, vector):
+        self.matrix = sp.vstack([self.matrix[:row], vector, self.matrix[row + 1:]], format='csr')
+
+    def _scores(self, rows):
+        """Rounded similarity of `rows` to every movie, with removed movies ruled out"""
+        scores = (self.matrix[rows] @ self.matrix.T).toarray().astype(np.float64)
+        scores[:, self.movies['removed'].to_numpy()] = -np.inf
+        return scores
+
+    def _recompute(self, rows):
+        if len(rows):
+            self.ids[rows], self.scores[rows] = top_k_rows(self._scores(rows), self.k, exclude=rows)
+
+    def _merge(self, row, scores):
+        """Insert `row` into every neighbor list whose K-th score it beats, keeping the lower-row tie-break"""
+        # Compare at the stored precision so ties with existing entries are recognised as ties
+        scores = np.round(scores, TIE_DECIMALS).astype(self.scores.dtype).astype(np.float64)
+        kth = self.scores[:, -1].astype(np.float64)
+        kth_ids = self.ids[:, -1]
+        beats = (scores > kth) | ((scores == kth) & (row < kth_ids))
+        beats[row] = False
+        beats &= ~np.any(self.ids == row, axis=1)
+        targets = np.flatnonzero(beats)
+        if targets.size == 0:
+            return targets
+
+        # Insert at the first position it outranks, leaving the existing order untouched
+        ids = self.ids[targets]
+        stored = self.scores[targets].astype(np.float64)
+        new = scores[targets, None]
+        position = ((stored > new) | ((stored == new) & (ids < row))).sum(axis=1, keepdims=True)
+        columns = np.arange(self.k)
+        shifted = np.maximum(columns - 1, 0)
+        self.ids[targets] = np.where(columns < position, ids, np.where(columns == position, row, ids[:, shifted]))
+        self.scores[targets] = np.where(columns < position, stored,
+                                        np.where(columns == position, new, stored[:, shifted]))
+        return targets
+
+    def _listing(self, row):
+        return np.flatnonzero(np.any(self.ids == row, axis=1))
+
+    def _store_details(self, movie_id, title, details):
+        if self.full_movies is None or details is None:
+            return
+        record = {column: details.get(column) for column in self.full_movies.columns}
+        record.update(movie_id=movie_id, title=title)
+        matches = np.flatnonzero(self.full_movies['movie_id'].to_numpy() == movie_id)
+        if matches.size:
+            for column, value in record.items():
+                self.full_movies.at[self.full_movies.index[matches[0]], column] = value
+        else:
+            self.full_movies = pd.concat([self.full_movies, pd.DataFrame([record])], ignore_index=True)
+
+    def add_movie(self, movie_id, title, tags, details=None):
+        """Append a movie and return its row; `details` optionally fills its `full_movies` record"""
+        if np.any((self.movies['movie_id'].to_numpy() == movie_id) & ~self.movies['removed'].to_numpy()):
+            raise ValueError(f"Movie id {movie_id!r} is already in the catalog")
+        row = len(self.movies)
+        label = self.movies.index.max() + 1 if row else 0
+        self.movies.loc[label] = {'movie_id': movie_id, 'title': title, 'tags': tags, 'removed': False}
+        self.matrix = sp.vstack([self.matrix, self._vectorize(tags)], format='csr')
+        self.ids = np.vstack([self.ids, np.zeros((1, self.k), dtype=self.ids.dtype)])
+        self.scores = np.vstack([self.scores, np.zeros((1, self.k), dtype=self.scores.dtype)])
+
+        scores = self._scores([row])
+        self.ids[row], self.scores[row] = top_k_rows(scores, self.k, exclude=[row])
+        self._merge(row, scores[0])
+        self._store_details(movie_id, title, details)
+        return row
+
+    def update_movie(self, movie_id, tags=None, title=None, details=None):
+        """Change a movie's tags, title or details in place and return its row"""
+        row = self._row(movie_id)
+        label = self.movies.index[row]
+        if title is not None:
+            self.movies.at[label, 'title'] = title
+        if tags is not None:
+            self.movies.at[label, 'tags'] = tags
+            listing = self._listing(row)
+            self._set_vector(row, self._vectorize(tags))
+            self._recompute(np.append(listing, row))
+            self._merge(row, self._scores([row])[0])
+        self._store_details(movie_id, self.movies.at[label, 'title'], details)
+        return row
+
+    def remove_movie(self, movie_id):
+        """Tombstone a movie so it is never recommended again and return its row"""
+        row = self._row(movie_id)
+        label = self.movies.index[row]
+        self.movies.at[label, 'removed'] = True
+        self.movies.at[label, 'tags'] = ''
+        self._set_vector(row, sp.csr_matrix((1, self.matrix.shape[1]), dtype=self.matrix.dtype))
+        self._recompute(self._listing(row))
+        return row
+
+    def save(self):
+        """Atomically write the movie list, sparse engine and neighbor index back to the artifacts folder"""
+        SparseEngine(self.engine.vectorizer, self.matrix).save(artifact_path(SPARSE_DIR))
+        save_array(os.path.join(artifact_path(NEIGHBORS_DIR), 'ids.npy'), self.ids)
+        save_array(os.path.join(artifact_path(NEIGHBORS_DIR), 'scores.npy'), self.scores)
+        _save_pickle(self.movies, artifact_path('movie_list.pkl'))
+        if self.full_movies is not None:
+            _save_pickle(self.full_movies, artifact_path('full_movies.pkl'))
@@ -0,0 +1,159 @@
+"""Persistent SQLite cache of TMDB card details keyed by movie_id.
+
+Entries older than their TTL are still served (stale-while-revalidate) while
+the caller refreshes them in the background. Movies TMDB reports as missing
+are cached as negative entries with a shorter TTL so they are not re-requested
+on every view. The cache is bounded by entry count and evicts the least
+recently accessed entries first.
+
+A cache hit is a read only: access times are collected in memory and written
+in one batch before each eviction, or at most every ``ACCESS_FLUSH_SECONDS``,
+so server processes sharing the file do not queue on SQLite's write lock for
+every card they show.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.environ.get('PERFECTPITCH_TMDB_CACHE', os.path.join('cache', 'tmdb_metadata.sqlite'))
+TTL_SECONDS = 7 * 24 * 3600
+NEGATIVE_TTL_SECONDS = 24 * 3600
+MAX_ENTRIES = 50000
+EVICT_EVERY = 100
+ACCESS_FLUSH_SECONDS = 60
+
+CacheEntry = namedtuple('CacheEntry', ['details', 'found', 'fetched_at', 'stale'])
+
+
+class MetadataCache:
+    """movie_id -> card details cache with TTL, negative entries and bounded size"""
+
+    def __init__(self, path=CACHE_PATH, ttl=TTL_SECONDS, negative_ttl=NEGATIVE_TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._accessed = {}
+        self._accessed_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    movie_id INTEGER PRIMARY KEY,
+                    details TEXT,
+                    found INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, movie_id):
+        """Return the CacheEntry for `movie_id`, or None when it has never been cached"""
+        conn = self._connection()
+        row = conn.execute("SELECT details, found, fetched_at FROM entries WHERE movie_id = ?",
+                           (int(movie_id),)).fetchone()
+        if row is None:
+            return None
+        details, found, fetched_at = row
+        now = time.time()
+        with self._accessed_lock:
+            self._accessed[int(movie_id)] = now
+            flush = time.monotonic() - self._flushed_at >= ACCESS_FLUSH_SECONDS
+        if flush:
+            try:
+                self.flush_accesses()
+            except sqlite3.Error as e:
+                # Access times only order evictions; a busy database must not fail the read
+                logger.debug("Deferred writing cache access times: %s", e)
+        ttl = self.ttl if found else self.negative_ttl
+        return CacheEntry(json.loads(details) if found else None, bool(found), fetched_at, now - fetched_at > ttl)
+
+    def put(self, movie_id, details):
+        """Store card details fetched for `movie_id`"""
+        self._write(movie_id, json.dumps(details), True)
+
+    def put_not_found(self, movie_id):
+        """Remember that TMDB has no movie `movie_id`"""
+        self._write(movie_id, None, False)
+
+    def _write(self, movie_id, details, found):
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO entries (movie_id, details, found, fetched_at, accessed_at) "
+                         "VALUES (?, ?, ?, ?, ?)", (int(movie_id), details, int(found), now, now))
+        with self._writes_lock:
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def flush_accesses(self):
+        """Write the access times recorded in memory since the last flush in one transaction"""
+        with self._accessed_lock:
+            accessed, self._accessed = self._accessed, {}
+            self._flushed_at = time.monotonic()
+        if not accessed:
+            return
+        try:
+            with self._connection() as conn:
+                conn.executemany("UPDATE entries SET accessed_at = MAX(accessed_at, ?) WHERE movie_id = ?",
+                                 [(accessed_at, movie_id) for movie_id, accessed_at in accessed.items()])
+        except sqlite3.Error:
+            # Keep them for the next flush, unless the movie has been read again since
+            with self._accessed_lock:
+                for movie_id, accessed_at in accessed.items():
+                    self._accessed.setdefault(movie_id, accessed_at)
+            raise
+
+    def evict(self):
+        """Drop the least recently accessed entries beyond `max_entries`"""
+        self.flush_accesses()
+        conn = self._connection()
+        with conn:
+            conn.execute("""
+                DELETE FROM entries WHERE movie_id IN (
+                    SELECT movie_id FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide metadata cache"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = MetadataCache()
+    return _default_cache
@@ -0,0 +1,72 @@
+"""Prefetched TMDB card details for the whole catalog.
+
+The catalog is fixed at build time, so ``python -m src.prefetch`` collects
+card details for every movie ahead of time into a small SQLite file in the
+artifacts folder. The app loads it into memory once per process and serves
+cards from it without touching the network.
+"""
+import json
+import os
+import sqlite3
+
+from src.resources import artifact_path, get_resource
+
+STORE_FILE = 'metadata.sqlite'
+
+
+class MetadataStore:
+    """movie_id -> card details table written by the prefetch job"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS movies (
+                    movie_id INTEGER PRIMARY KEY,
+                    details TEXT,
+                    found INTEGER NOT NULL
+                )
+            """)
+
+    def completed_ids(self):
+        """Ids already fetched, found or not, used to resume an interrupted job"""
+        return {row[0] for row in self.conn.execute("SELECT movie_id FROM movies")}
+
+    def put_many(self, results):
+        """Store (movie_id, details) pairs in one transaction; details of None mark a movie TMDB does not have"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO movies (movie_id, details, found) VALUES (?, ?, ?)",
+                [(int(movie_id), json.dumps(details) if details is not None else None, int(details is not None))
+                 for movie_id, details in results])
+
+    def load_all(self):
+        """Every stored movie as a dict of movie_id -> details (None for movies TMDB does not have)"""
+        return {movie_id: json.loads(details) if found else None
+                for movie_id, details, found in self.conn.execute("SELECT movie_id, details, found FROM movies")}
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM movies").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+def _load_store(path):
+    store = MetadataStore(path)
+    try:
+        return store.load_all()
+    finally:
+        store.close()
+
+
+def load_metadata_store(filename=STORE_FILE):
+    """Prefetched details keyed by movie_id, loaded once per process; empty when the job has not run"""
+    path = artifact_path(filename)
+    if not os.path.exists(path):
+        return {}
+    return get_resource(filename, lambda: _load_store(path))
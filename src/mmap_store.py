@@ -0,0 +1,84 @@
+"""Raw ``.npy`` arrays opened with memory mapping.
+
+Every Streamlit process that opens the same file maps the same page-cache
+pages, so the similarity data is held in RAM once per host rather than once
+per process. Opening a file does not read it; a cold start only faults in
+the rows it actually touches.
+
+Files are written to a temporary name and renamed into place. Processes that
+already have the old file mapped keep reading it until they reopen.
+
+Arrays inside an uncompressed ``.npz`` archive are stored as plain ``.npy``
+members, so ``open_npz_array`` can memory-map them in place as well.
+"""
+import hashlib
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+
+def _tmp_path(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return f"{path}.tmp.{os.getpid()}"
+
+
+def save_array(path, array):
+    """Write `array` as a raw .npy file, atomically replacing any existing file"""
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+
+
+def create_array(path, shape, dtype):
+    """Writable memory-mapped .npy at a temporary name, to be filled block by block and then `commit_array`-ed"""
+    return np.lib.format.open_memmap(_tmp_path(path), mode='w+', dtype=dtype, shape=shape)
+
+
+def commit_array(array, path):
+    """Flush an array from `create_array` and atomically move it to `path`"""
+    array.flush()
+    os.replace(array.filename, path)
+
+
+def open_array(path, writable=False):
+    """Memory-map a .npy file read-only, or read-write for build workers filling their blocks"""
+    return np.load(path, mmap_mode='r+' if writable else 'r')
+
+
+def open_npz_array(path, name):
+    """Memory-map array `name` of an uncompressed .npz archive read-only (compressed members are read into memory)"""
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(f"{name}.npy")
+        if info.compress_type != zipfile.ZIP_STORED:
+            with archive.open(info) as f:
+                return np.lib.format.read_array(f)
+    with open(path, 'rb') as f:
+        # The member's data follows its local file header, whose name and extra fields vary in length
+        f.seek(info.header_offset + 26)
+        name_length, extra_length = struct.unpack('<HH', f.read(4))
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if dtype.hasobject:
+        raise ValueError(f"{name} in {path} holds Python objects and cannot be memory-mapped")
+    if not shape or 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortran_order else 'C')
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,133 @@
+"""Compact top-K neighbor index built from the dense similarity matrix.
+
+``similarity.pkl`` stores the full N x N cosine similarity matrix, but the
+app only ever reads the best few entries of one row. The neighbor index keeps
+each row's top-K neighbor ids (int32) and scores (float16 or float32), which
+is roughly N / K times smaller and answers a lookup in O(K).
+
+The index is stored as raw ``.npy`` files in ``artifacts/neighbors/`` and
+memory-mapped, so worker processes on one host share a single copy. Build it
+from the existing artifact with::
+
+    python -m src.neighbors --k 50 --dtype float16
+
+``--dense`` additionally converts the dense matrix to a memory-mapped
+``similarity.npy`` for deployments that still need full rows.
+"""
+import argparse
+import os
+import pickle
+
+import numpy as np
+
+from src.mmap_store import open_array, save_array
+from src.ranking import top_k_rows
+from src.resources import artifact_path, get_resource
+
+DEFAULT_K = 50
+MAX_K = 100
+NEIGHBORS_DIR = 'neighbors'
+DENSE_FILE = 'similarity.npy'
+SCORE_DTYPES = ('float16', 'float32')
+
+
+class NeighborIndex:
+    """Top-K neighbor ids and scores for every movie row"""
+
+    def __init__(self, ids, scores):
+        if ids.shape != scores.shape:
+            raise ValueError(f"ids shape {ids.shape} does not match scores shape {scores.shape}")
+        self.ids = ids
+        self.scores = scores
+
+    @property
+    def k(self):
+        return self.ids.shape[1]
+
+    @property
+    def size_bytes(self):
+        return self.ids.nbytes + self.scores.nbytes
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def neighbors(self, row, k=5, offset=0):
+        """Return (ids, scores) of neighbors ranked `offset` to `offset + k` for `row`, best first
+
+        Ranks beyond the stored K are simply not returned, so the last page may be short or empty.
+        Padding of rows with fewer than K neighbors (id -1) is dropped.
+        """
+        ids = np.array(self.ids[row, offset:offset + k])
+        scores = np.array(self.scores[row, offset:offset + k], dtype=np.float32)
+        return ids[ids >= 0], scores[ids >= 0]
+
+    def save(self, directory):
+        save_array(os.path.join(directory, 'ids.npy'), self.ids)
+        save_array(os.path.join(directory, 'scores.npy'), self.scores)
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map an index saved with `save`, read-only"""
+        return cls(open_array(os.path.join(directory, 'ids.npy')),
+                   open_array(os.path.join(directory, 'scores.npy')))
+
+
+def build_neighbor_index(similarity, k=DEFAULT_K, score_dtype='float16', block_rows=512):
+    """Keep the top-`k` neighbors of every row of a dense similarity matrix, excluding the row itself"""
+    if score_dtype not in SCORE_DTYPES:
+        raise ValueError(f"score_dtype must be one of {SCORE_DTYPES}, got {score_dtype!r}")
+    n = similarity.shape[0]
+    if not 0 < k < n:
+        raise ValueError(f"k must be between 1 and {n - 1}, got {k}")
+
+    ids = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=score_dtype)
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        ids[start:stop], scores[start:stop] = top_k_rows(similarity[start:stop], k, exclude=np.arange(start, stop))
+    return NeighborIndex(ids, scores)
+
+
+def load_neighbor_index(dirname=NEIGHBORS_DIR):
+    """Map the neighbor index once per process, or return None when it has not been built"""
+    path = artifact_path(dirname)
+    if not os.path.exists(os.path.join(path, 'ids.npy')):
+        return None
+    return get_resource(dirname, lambda: NeighborIndex.load(path))
+
+
+def load_dense_similarity(filename=DENSE_FILE):
+    """Map the dense similarity matrix once per process, or return None when it has not been converted"""
+    path = artifact_path(filename)
+    if not os.path.exists(path):
+        return None
+    return get_resource(filename, lambda: open_array(path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the top-K neighbor index from similarity.pkl")
+    parser.add_argument('--similarity', default=artifact_path('similarity.pkl'))
+    parser.add_argument('--output', default=artifact_path(NEIGHBORS_DIR))
+    parser.add_argument('--k', type=int, default=DEFAULT_K)
+    parser.add_argument('--dtype', choices=SCORE_DTYPES, default='float16')
+    parser.add_argument('--dense', action='store_true',
+                        help=f"also write the dense matrix as float32 {DENSE_FILE} for memory mapping")
+    args = parser.parse_args(argv)
+
+    if not 0 < args.k <= MAX_K:
+        parser.error(f"--k must be between 1 and {MAX_K}")
+
+    with open(args.similarity, 'rb') as f:
+        similarity = pickle.load(f)
+    index = build_neighbor_index(similarity, k=args.k, score_dtype=args.dtype)
+    index.save(args.output)
+    print(f"Wrote {args.output}: {len(index)} rows x {index.k} neighbors, "
+          f"{index.size_bytes / 1e6:.1f} MB (dense matrix was {similarity.nbytes / 1e6:.1f} MB)")
+    if args.dense:
+        dense_path = artifact_path(DENSE_FILE)
+        save_array(dense_path, similarity.astype(np.float32))
+        print(f"Wrote {dense_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Offline job that prefetches TMDB card details for every movie in the catalog.
+
+Usage::
+
+    python -m src.prefetch --rate 20 --concurrency 8
+
+Requests are spread over a bounded worker pool and throttled by a token
+bucket. Results are committed to the metadata store in batches, which doubles
+as the checkpoint: re-running the job skips every movie already stored, so an
+interrupted run resumes where it stopped. Only a small window of fetches is
+queued at a time, so an interrupt or error cancels the queue at once, and the
+movies finished since the last checkpoint are stored before the job exits.
+Movies that failed with a transient error are not stored and are retried on
+the next run.
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from src.metadata_store import STORE_FILE, MetadataStore
+from src.ratelimit import TokenBucket
+from src.resources import artifact_path, load_pickle
+from src.tmdb import parse_movie_details
+from src.tmdb_client import MovieNotFound, TMDBClient, TMDBError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE = 20
+DEFAULT_CONCURRENCY = 8
+CHECKPOINT_EVERY = 100
+# Fetches queued per worker; more ids are submitted only as earlier ones finish
+IN_FLIGHT_PER_WORKER = 2
+
+
+def _fetch(client, bucket, movie_id):
+    bucket.acquire()
+    try:
+        return movie_id, parse_movie_details(client.get_movie(movie_id))
+    except MovieNotFound:
+        return movie_id, None
+
+
+def prefetch(movie_ids, store, client, rate=DEFAULT_RATE, concurrency=DEFAULT_CONCURRENCY,
+             checkpoint_every=CHECKPOINT_EVERY):
+    """Fetch every id not yet in `store`, returning counts of fetched, missing, failed and skipped movies"""
+    done = store.completed_ids()
+    pending = [movie_id for movie_id in dict.fromkeys(movie_ids) if movie_id not in done]
+    counts = {'fetched': 0, 'not_found': 0, 'failed': 0, 'skipped': len(done)}
+    bucket = TokenBucket(rate, capacity=concurrency)
+    batch = []
+    start = time.perf_counter()
+
+    queue = iter(pending)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        in_flight = set()
+        for movie_id in queue:
+            in_flight.add(executor.submit(_fetch, client, bucket, movie_id))
+            if len(in_flight) >= IN_FLIGHT_PER_WORKER * concurrency:
+                break
+        while in_flight:
+            finished_futures, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished_futures:
+                movie_id = next(queue, None)
+                if movie_id is not None:
+                    in_flight.add(executor.submit(_fetch, client, bucket, movie_id))
+                try:
+                    movie_id, details = future.result()
+                except TMDBError as e:
+                    counts['failed'] += 1
+                    logger.warning("%s", e)
+                    continue
+                counts['fetched' if details is not None else 'not_found'] += 1
+                batch.append((movie_id, details))
+                if len(batch) >= checkpoint_every:
+                    store.put_many(batch)
+                    batch = []
+                    finished = counts['fetched'] + counts['not_found'] + counts['failed']
+                    logger.info("Checkpoint: %d/%d movies (%.1f/s)", finished, len(pending),
+                                finished / (time.perf_counter() - start))
+    except BaseException:
+        # Cancel the queued fetches so no more quota is spent; only those already running finish
+        executor.shutdown(wait=True, cancel_futures=True)
+        if batch:
+            try:
+                store.put_many(batch)
+            except Exception as e:
+                logger.warning("Could not checkpoint %d finished movies: %s", len(batch), e)
+        raise
+    executor.shutdown()
+    if batch:
+        store.put_many(batch)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prefetch TMDB card details for the whole catalog")
+    parser.add_argument('--movies', default='movie_list.pkl', help="catalog artifact inside the artifacts folder")
+    parser.add_argument('--output', default=artifact_path(STORE_FILE))
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="requests per second")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    movie_ids = load_pickle(args.movies)['movie_id'].tolist()
+    store = MetadataStore(args.output)
+    client = TMDBClient(pool_size=args.concurrency)
+    try:
+        counts = prefetch(movie_ids, store, client, rate=args.rate, concurrency=args.concurrency)
+    finally:
+        store.close()
+        client.close()
+    print(f"Prefetched {counts['fetched']} movies, {counts['not_found']} not on TMDB, "
+          f"{counts['failed']} failed (re-run to retry), {counts['skipped']} already stored")
+    print(f"Connections: {client.connection_stats()}")
+
+
+if __name__ == '__main__':
+    main()
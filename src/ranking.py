@@ -0,0 +1,86 @@
+"""Vectorized top-k selection over similarity scores.
+
+``np.argpartition`` finds the best ``offset + k`` rows in O(N); only those are
+then sorted. Ties are broken by the lower row index so the same query always
+returns the same page, even when scores are equal across a page boundary.
+"""
+import numpy as np
+
+# Similarities are rounded to this many decimals before ranking neighbors offline, so exact ties
+# computed with a different summation order (sparse vs dense products) still compare equal
+TIE_DECIMALS = 9
+
+
+def _empty():
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+
+def top_k(scores, k=5, offset=0, exclude=None, mask=None):
+    """Return (rows, scores) of ranks `offset` to `offset + k`, best first
+
+    `exclude` is a row index or array of row indices that are never returned,
+    typically the query movie itself. `mask` is an optional boolean array;
+    rows where it is False are never returned either, and are ruled out before
+    selection so a page is only short when too few rows match.
+    """
+    if k <= 0 or offset < 0:
+        raise ValueError(f"k must be positive and offset non-negative, got k={k}, offset={offset}")
+
+    scores = np.asarray(scores)
+    if exclude is not None or mask is not None:
+        scores = scores.astype(np.float64, copy=True)
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        if mask is not None:
+            scores[~mask] = -np.inf
+
+    stop = min(offset + k, scores.shape[0])
+    if stop <= offset:
+        return _empty()
+
+    best = np.argpartition(-scores, stop - 1)[:stop]
+    threshold = scores[best].min()
+    if not np.isfinite(threshold):
+        # Fewer than `stop` rows may be returned, and all of them were selected
+        rows = best[np.isfinite(scores[best])]
+        rows = rows[np.lexsort((rows, -scores[rows]))][offset:]
+        return rows, scores[rows].astype(np.float32)
+    # Rows above the last selected score were all selected; rows tied with it may not have been, so the
+    # lowest tied rows fill the remaining places and the result does not depend on partition order
+    above = best[scores[best] > threshold]
+    above = above[np.lexsort((above, -scores[above]))]
+    tied = np.flatnonzero(scores == threshold)[:stop - above.size]
+    rows = np.concatenate([above, tied])[offset:stop]
+    return rows, scores[rows].astype(np.float32)
+
+
+def top_k_rows(scores, k=5, exclude=None):
+    """Row-wise top-`k` of a 2-D score matrix, returning (ids, scores) arrays of shape (n, k)
+
+    `exclude` gives one column per row to skip, e.g. each query's own row.
+    Scores are rounded to TIE_DECIMALS so floating-point noise cannot break exact ties.
+    Rows with fewer than `k` finite scores are padded with id -1 and score -inf.
+    """
+    scores = np.round(np.array(scores, dtype=np.float64), TIE_DECIMALS)
+    n_rows, n_cols = scores.shape
+    k = min(k, n_cols - (1 if exclude is not None else 0))
+    if k <= 0:
+        return np.empty((n_rows, 0), dtype=np.int32), np.empty((n_rows, 0), dtype=np.float32)
+    if exclude is not None:
+        scores[np.arange(n_rows), exclude] = -np.inf
+
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.lexsort((candidates, -candidate_scores), axis=1)
+    ids = np.take_along_axis(candidates, order, axis=1).astype(np.int32)
+    top_scores = np.take_along_axis(candidate_scores, order, axis=1).astype(np.float32)
+
+    # Rows with ties across the k-th place, or with too few finite scores to fill k places, are re-ranked
+    # one by one to keep the lower-row rule
+    kth = candidate_scores.min(axis=1, keepdims=True)
+    redo = ((scores >= kth).sum(axis=1) > k) | ~np.isfinite(kth[:, 0])
+    for row in np.flatnonzero(redo):
+        row_ids, row_scores = top_k(scores[row], k)
+        ids[row], top_scores[row] = -1, -np.inf
+        ids[row, :row_ids.size], top_scores[row, :row_ids.size] = row_ids, row_scores
+    return ids, top_scores
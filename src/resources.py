@@ -0,0 +1,109 @@
+"""Process-wide artifact loading.
+
+Streamlit re-executes ``app.py`` on every widget interaction, but modules
+imported from ``src`` stay in ``sys.modules`` for the lifetime of the server
+process. Artifacts loaded through this module are therefore read from disk
+once per process and shared by every session and rerun.
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+ARTIFACTS_DIR = os.environ.get('PERFECTPITCH_ARTIFACTS', 'artifacts')
+
+_resources = {}
+_stats = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def artifact_path(filename):
+    """Return the path of an artifact file inside the artifacts folder"""
+    return os.path.join(ARTIFACTS_DIR, filename)
+
+
+def _lock_for(name):
+    with _locks_guard:
+        if name not in _locks:
+            _locks[name] = threading.Lock()
+        return _locks[name]
+
+
+def _rss_bytes():
+    """Current resident set size of this process, or None when unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def estimate_size(obj):
+    """Best-effort in-memory size of a loaded artifact in bytes"""
+    if hasattr(obj, 'memory_usage') and hasattr(obj, 'columns'):
+        return int(obj.memory_usage(deep=True).sum())
+    if hasattr(obj, 'indptr') and hasattr(obj, 'data'):
+        return int(obj.data.nbytes + obj.indices.nbytes + obj.indptr.nbytes)
+    if hasattr(obj, 'nbytes'):
+        return int(obj.nbytes)
+    if hasattr(obj, 'size_bytes'):
+        return int(obj.size_bytes)
+    return None
+
+
+def get_resource(name, loader):
+    """Return the resource `name`, calling `loader()` only the first time in this process"""
+    if name in _resources:
+        return _resources[name]
+
+    with _lock_for(name):
+        if name in _resources:
+            return _resources[name]
+
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        value = loader()
+        elapsed = time.perf_counter() - start
+        rss_after = _rss_bytes()
+
+        _stats[name] = {
+            'load_seconds': elapsed,
+            'size_bytes': estimate_size(value),
+            'rss_delta_bytes': (rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+        }
+        _resources[name] = value
+        logger.info("Loaded %s in %.3fs (size=%s bytes, rss delta=%s bytes)",
+                    name, elapsed, _stats[name]['size_bytes'], _stats[name]['rss_delta_bytes'])
+        return value
+
+
+def load_pickle(filename):
+    """Load a pickled artifact once per process"""
+    def loader():
+        with open(artifact_path(filename), 'rb') as f:
+            return pickle.load(f)
+    return get_resource(filename, loader)
+
+
+def load_joblib(filename):
+    """Load a joblib artifact once per process"""
+    return get_resource(filename, lambda: joblib.load(artifact_path(filename)))
+
+
+def resource_report():
+    """Load time and size of every artifact loaded so far, keyed by name"""
+    return {name: dict(stats) for name, stats in _stats.items()}
+
+
+def clear_resources():
+    """Drop every cached artifact so the next access reloads it from disk"""
+    with _locks_guard:
+        _resources.clear()
+        _stats.clear()
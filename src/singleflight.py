@@ -0,0 +1,52 @@
+"""Single-flight deduplication of concurrent calls.
+
+While a call for a key is in flight, other threads asking for the same key
+wait for it and share its result (or exception) instead of starting their
+own. Nothing is cached once the call finishes.
+"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time, sharing the outcome with concurrent callers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {'calls': 0, 'shared': 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return `fn(*args, **kwargs)`, joining an in-flight call for `key` if there is one"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.stats['shared'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.stats['calls'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
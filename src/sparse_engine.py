@@ -0,0 +1,242 @@
+"""On-the-fly cosine similarity over the sparse tag matrix.
+
+Instead of materialising the dense count matrix and the N x N similarity
+matrix, the engine keeps the fitted ``CountVectorizer`` and the L2-normalised
+CSR tag matrix. Cosine similarity against every movie is then one sparse
+matrix-vector product per query, and memory grows with the number of
+non-zero tag counts rather than with N squared.
+
+The engine is saved to ``artifacts/sparse/`` as first-class artifacts:
+
+* ``vocabulary.json`` - the fitted terms in column order, from which the
+  vectorizer is rebuilt without unpickling anything;
+* ``tags.npz`` - the CSR tag matrix, written uncompressed so its arrays are
+  memory-mapped on load rather than read;
+* ``manifest.json`` - shape, dtype, vectorizer settings and the size and
+  SHA-256 of every file. It is written last, so a folder without one is
+  incomplete. Loading checks shapes and sizes only; ``--verify`` also
+  checks the checksums.
+
+Build it from ``movie_list.pkl`` with::
+
+    python -m src.sparse_engine
+"""
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+from src.mmap_store import file_checksum, open_npz_array
+from src.ranking import top_k
+from src.resources import artifact_path, get_resource, load_pickle
+from src.text import normalize_tags
+
+SPARSE_DIR = 'sparse'
+MAX_FEATURES = 5000
+MANIFEST_FILE = 'manifest.json'
+VOCABULARY_FILE = 'vocabulary.json'
+MATRIX_FILE = 'tags.npz'
+# CountVectorizer settings that, with the vocabulary, reproduce the fitted vectorizer exactly
+VECTORIZER_SETTINGS = ('lowercase', 'stop_words', 'token_pattern', 'ngram_range', 'analyzer', 'binary')
+
+
+class SparseEngine:
+    """Fitted vectorizer plus L2-normalised CSR tag matrix answering cosine queries"""
+
+    def __init__(self, vectorizer, matrix):
+        self.vectorizer = vectorizer
+        self.matrix = sp.csr_matrix(matrix, dtype=np.float32)
+
+    @property
+    def size_bytes(self):
+        return self.matrix.data.nbytes + self.matrix.indices.nbytes + self.matrix.indptr.nbytes
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def row_vector(self, row):
+        """Dense normalised tag vector of catalog row `row`"""
+        return self.matrix[row].toarray().ravel()
+
+    def scores(self, query):
+        """Cosine similarity of every movie to a normalised dense query vector"""
+        return self.matrix @ query
+
+    def similar(self, row, k=5, offset=0, backend=None, mask=None):
+        """Return (rows, scores) of neighbors ranked `offset` to `offset + k` for `row`, best first
+
+        `backend` is an optional search backend from ``src.ann``; by default every movie is scored exactly.
+        `mask` optionally restricts results to rows where it is True (see ``src.filters``).
+        """
+        if backend is not None:
+            return backend.search(self.row_vector(row), k, offset, exclude=row, mask=mask)
+        return top_k(self.scores(self.row_vector(row)), k, offset, exclude=row, mask=mask)
+
+    def text_vector(self, text):
+        """Normalised dense query for free text, stemmed and vectorized like the catalog tags"""
+        counts = self.vectorizer.transform([normalize_tags(text)])
+        return normalized_features(counts).toarray().ravel()
+
+    def search_text(self, text, k=5, offset=0, backend=None, mask=None):
+        """Return (rows, scores) of movies ranked `offset` to `offset + k` for a free-text description
+
+        Nothing is returned when none of the words is in the tag vocabulary.
+        """
+        query = self.text_vector(text)
+        if not query.any():
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if backend is not None:
+            return backend.search(query, k, offset, mask=mask)
+        return top_k(self.scores(query), k, offset, mask=mask)
+
+    def profile_vector(self, rows, weights=None):
+        """Normalised dense query combining the tag vectors of `rows`, each scaled by its weight (default 1)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        weights = np.ones(len(rows), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+        if weights.shape != rows.shape:
+            raise ValueError(f"Expected {len(rows)} weights, got {weights.shape[0]}")
+        # One sparse row selecting and weighting the seeds, so combining them is a single product
+        selector = sp.csr_matrix((weights, (np.zeros_like(rows), rows)), shape=(1, self.matrix.shape[0]))
+        query = (selector @ self.matrix).toarray().ravel()
+        norm = np.linalg.norm(query)
+        return query / norm if norm else query
+
+    def similar_to_many(self, rows, k=5, offset=0, weights=None, backend=None, mask=None):
+        """Return (rows, scores) of movies ranked `offset` to `offset + k` for a set of liked `rows`
+
+        The seeds' tag vectors are summed with optional `weights` into one profile, every movie is
+        scored against it and the seeds themselves are never returned.
+        """
+        query = self.profile_vector(rows, weights)
+        exclude = np.unique(np.asarray(rows, dtype=np.int64))
+        if backend is not None:
+            return backend.search(query, k, offset, exclude=exclude, mask=mask)
+        return top_k(self.scores(query), k, offset, exclude=exclude, mask=mask)
+
+    def save(self, directory):
+        """Write the vocabulary, the tag matrix and then the manifest, each replaced atomically"""
+        os.makedirs(directory, exist_ok=True)
+        # A vectorizer rebuilt from a vocabulary only sets vocabulary_ once it has transformed something
+        vocabulary = getattr(self.vectorizer, 'vocabulary_', None) or self.vectorizer.vocabulary
+        terms = [None] * len(vocabulary)
+        for term, column in vocabulary.items():
+            terms[column] = term
+        _write_atomic(os.path.join(directory, VOCABULARY_FILE), lambda f: f.write(json.dumps(terms).encode()))
+        _write_atomic(os.path.join(directory, MATRIX_FILE), lambda f: sp.save_npz(f, self.matrix, compressed=False))
+
+        params = self.vectorizer.get_params()
+        manifest = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'shape': list(self.matrix.shape),
+            'dtype': str(self.matrix.dtype),
+            'nnz': int(self.matrix.nnz),
+            'vectorizer': {name: params[name] for name in VECTORIZER_SETTINGS},
+            'files': {filename: {'bytes': os.path.getsize(os.path.join(directory, filename)),
+                                 'sha256': file_checksum(os.path.join(directory, filename))}
+                      for filename in (VOCABULARY_FILE, MATRIX_FILE)},
+        }
+        _write_atomic(os.path.join(directory, MANIFEST_FILE),
+                      lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+
+    @classmethod
+    def load(cls, directory):
+        """Rebuild the vectorizer from its vocabulary and memory-map the tag matrix
+
+        Folders saved before the manifest existed (``vectorizer.pkl`` plus a compressed ``tags.npz``) still load.
+        """
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return cls(joblib.load(os.path.join(directory, 'vectorizer.pkl')),
+                       sp.load_npz(os.path.join(directory, MATRIX_FILE)))
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        for filename, expected in manifest['files'].items():
+            size = os.path.getsize(os.path.join(directory, filename))
+            if size != expected['bytes']:
+                raise ValueError(f"{filename} in {directory} is {size} bytes, the manifest expects {expected['bytes']}")
+        with open(os.path.join(directory, VOCABULARY_FILE)) as f:
+            terms = json.load(f)
+        settings = dict(manifest['vectorizer'], ngram_range=tuple(manifest['vectorizer']['ngram_range']))
+        vectorizer = CountVectorizer(vocabulary={term: column for column, term in enumerate(terms)}, **settings)
+
+        path = os.path.join(directory, MATRIX_FILE)
+        matrix = sp.csr_matrix(tuple(open_npz_array(path, name) for name in ('data', 'indices', 'indptr')),
+                               shape=tuple(manifest['shape']), copy=False)
+        if str(matrix.dtype) != manifest['dtype'] or matrix.nnz != manifest['nnz'] or \
+                matrix.shape[1] != len(vectorizer.vocabulary):
+            raise ValueError(f"Tag matrix in {directory} does not match its manifest")
+        return cls(vectorizer, matrix)
+
+
+def _write_atomic(path, write):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def verify_sparse_engine(directory):
+    """Names of the files in `directory` whose SHA-256 differs from the manifest; empty when all match"""
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    return [filename for filename, expected in manifest['files'].items()
+            if file_checksum(os.path.join(directory, filename)) != expected['sha256']]
+
+
+def fit_tag_counts(tags, max_features=MAX_FEATURES):
+    """Fit the notebook's CountVectorizer on stemmed tag strings, returning it and the CSR count matrix"""
+    vectorizer = CountVectorizer(max_features=max_features, stop_words='english')
+    return vectorizer, vectorizer.fit_transform(tags)
+
+
+def normalized_features(counts, dtype=np.float32):
+    """L2-normalise tag count rows so that dot products are cosine similarities"""
+    return normalize(counts.astype(dtype), norm='l2', copy=False)
+
+
+def build_sparse_engine(tags, max_features=MAX_FEATURES):
+    """Fit the tag vectorizer and keep the normalised float32 tag matrix for serving"""
+    vectorizer, counts = fit_tag_counts(tags, max_features)
+    return SparseEngine(vectorizer, normalized_features(counts))
+
+
+def load_sparse_engine(dirname=SPARSE_DIR):
+    """Load the sparse engine once per process, or return None when it has not been built"""
+    path = artifact_path(dirname)
+    if not os.path.exists(os.path.join(path, MATRIX_FILE)):
+        return None
+    return get_resource(dirname, lambda: SparseEngine.load(path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit the tag vectorizer and save the sparse tag matrix")
+    parser.add_argument('--movies', default='movie_list.pkl', help="catalog artifact inside the artifacts folder")
+    parser.add_argument('--output', default=artifact_path(SPARSE_DIR))
+    parser.add_argument('--max-features', type=int, default=MAX_FEATURES)
+    parser.add_argument('--verify', action='store_true',
+                        help="only check the saved files in --output against their manifest checksums")
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        mismatched = verify_sparse_engine(args.output)
+        if mismatched:
+            raise SystemExit(f"Checksum mismatch in {args.output}: {', '.join(mismatched)}")
+        print(f"{args.output}: every file matches its manifest")
+        return
+
+    engine = build_sparse_engine(load_pickle(args.movies)['tags'], max_features=args.max_features)
+    engine.save(args.output)
+    n, vocabulary = engine.matrix.shape
+    print(f"Wrote {args.output}: {n} movies x {vocabulary} terms, {engine.matrix.nnz} non-zeros, "
+          f"{engine.size_bytes / 1e6:.1f} MB (dense similarity would be {n * n * 8 / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+"""Text normalisation shared with the notebook that built ``movie_list.pkl``.
+
+Catalog tags were lower-cased and Porter-stemmed word by word (the
+notebook's ``stems()``), so free text has to go through the same steps before
+it is vectorized, or "aliens" would never meet the stored "alien".
+"""
+from nltk.stem import PorterStemmer
+
+_stemmer = PorterStemmer()
+
+
+def stems(text):
+    """Porter-stem every whitespace-separated word, like the notebook's `stems()`"""
+    return " ".join(_stemmer.stem(word) for word in text.split())
+
+
+def normalize_tags(text):
+    """Lower-case and stem free text the way catalog tags were preprocessed"""
+    return stems(text.lower())
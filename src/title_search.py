@@ -0,0 +1,182 @@
+"""Typo-tolerant title search.
+
+The notebook resolves user input with ``difflib.get_close_matches``, which
+compares the query against every title. This index answers the same
+question from two small structures built once per process:
+
+* a SymSpell-style deletes dictionary over the words that occur in titles,
+  which corrects each query word to the most frequent title word within
+  ``MAX_EDIT_DISTANCE`` edits ("avatr" -> "avatar") with a few dictionary
+  lookups instead of a scan;
+* a character-trigram inverted index over whole titles, which ranks titles
+  by trigram overlap (Dice coefficient) with the corrected query, so
+  partial titles and word-order slips still match.
+
+Candidates are generated from the query's rarest trigrams within a fixed
+posting budget, then scored exactly against every query trigram, so lookup
+cost is bounded by the budget rather than by the catalog size.
+"""
+import re
+from collections import Counter
+
+import numpy as np
+
+from src.catalog import load_movie_index
+from src.resources import get_resource
+
+MAX_EDIT_DISTANCE = 2
+# Deletes are generated from the first PREFIX_LENGTH characters only, which bounds the dictionary size
+PREFIX_LENGTH = 7
+# Candidates are nominated by the query's rarest trigrams, reading at most POSTING_BUDGET postings
+# beyond the first MIN_NOMINATING_TRIGRAMS; common trigrams then only help score them
+MIN_NOMINATING_TRIGRAMS = 3
+POSTING_BUDGET = 20000
+MAX_CANDIDATES = 200
+MIN_SCORE = 0.3
+
+
+def normalize_title(title):
+    """Lower-case, drop punctuation and collapse whitespace"""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', str(title).lower()).split())
+
+
+def trigrams(text):
+    """Set of character trigrams of `text`, padded so word and title boundaries count"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _deletes(word, max_distance):
+    """Every string reachable from `word` by deleting up to `max_distance` characters"""
+    found = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {candidate[:i] + candidate[i + 1:] for candidate in frontier for i in range(len(candidate))}
+        found |= frontier
+    return found
+
+
+def edit_distance(a, b):
+    """Optimal-string-alignment distance: insertions, deletions, substitutions and adjacent swaps"""
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class TitleSearch:
+    """Exact, spelling-corrected and trigram lookups from free-typed text to catalog rows"""
+
+    def __init__(self, titles, rows=None):
+        self.titles = list(titles)
+        self.rows = np.arange(len(self.titles)) if rows is None else np.asarray(rows)
+        keys = [normalize_title(title) for title in self.titles]
+
+        self._exact = {}
+        for position, key in enumerate(keys):
+            self._exact.setdefault(key, position)
+
+        postings = {}
+        sizes = []
+        for position, key in enumerate(keys):
+            grams = trigrams(key)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        self._postings = {gram: np.asarray(positions, dtype=np.int32) for gram, positions in postings.items()}
+        self._sizes = np.asarray(sizes, dtype=np.int32)
+
+        self._word_counts = Counter(word for key in keys for word in key.split())
+        self._word_deletes = {}
+        for word in self._word_counts:
+            for variant in _deletes(word[:PREFIX_LENGTH], MAX_EDIT_DISTANCE):
+                self._word_deletes.setdefault(variant, []).append(word)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def correct_word(self, word):
+        """The title word closest to `word` (fewest edits, then most frequent), or `word` when none is close"""
+        if word in self._word_counts:
+            return word
+        # Look one edit away first and only widen the search when nothing is found there
+        for max_distance in range(1, MAX_EDIT_DISTANCE + 1):
+            candidates = {candidate for variant in _deletes(word[:PREFIX_LENGTH], max_distance)
+                          for candidate in self._word_deletes.get(variant, ())
+                          if abs(len(candidate) - len(word)) <= max_distance}
+            best = None
+            for candidate in candidates:
+                distance = edit_distance(word, candidate)
+                if distance <= max_distance:
+                    rank = (distance, -self._word_counts[candidate], candidate)
+                    if best is None or rank < best:
+                        best = rank
+            if best is not None:
+                return best[2]
+        return word
+
+    def correct(self, query):
+        """`query` normalised, with every word corrected to its closest title word"""
+        return ' '.join(self.correct_word(word) for word in normalize_title(query).split())
+
+    def _trigram_matches(self, text, n, min_score):
+        grams = [gram for gram in trigrams(text) if gram in self._postings]
+        if not grams:
+            return []
+        grams.sort(key=lambda gram: len(self._postings[gram]))
+        rare = grams[:MIN_NOMINATING_TRIGRAMS]
+        read = sum(len(self._postings[gram]) for gram in rare)
+        for gram in grams[MIN_NOMINATING_TRIGRAMS:]:
+            read += len(self._postings[gram])
+            if read > POSTING_BUDGET:
+                break
+            rare.append(gram)
+
+        # Rare trigrams nominate candidates, every trigram of the query scores them
+        candidates, hits = np.unique(np.concatenate([self._postings[gram] for gram in rare]), return_counts=True)
+        if candidates.size > MAX_CANDIDATES:
+            candidates = candidates[np.argsort(-hits, kind='stable')[:MAX_CANDIDATES]]
+        shared = np.zeros(candidates.size, dtype=np.int32)
+        for gram in grams:
+            posting = self._postings[gram]
+            found = np.searchsorted(posting, candidates)
+            shared += (found < posting.size) & (posting[np.minimum(found, posting.size - 1)] == candidates)
+        scores = 2 * shared / (len(trigrams(text)) + self._sizes[candidates])
+
+        order = np.lexsort((candidates, -scores))[:n]
+        return [(int(self.rows[candidates[i]]), float(scores[i])) for i in order if scores[i] >= min_score]
+
+    def search(self, query, n=5, min_score=MIN_SCORE):
+        """Up to `n` (row, score) pairs of titles matching `query`, best first; an exact title scores 1"""
+        key = normalize_title(query)
+        if not key:
+            return []
+        if key in self._exact:
+            return [(int(self.rows[self._exact[key]]), 1.0)]
+        corrected = self.correct(key)
+        if corrected in self._exact:
+            return [(int(self.rows[self._exact[corrected]]), 1.0)]
+        return self._trigram_matches(corrected, n, min_score)
+
+    def best_match(self, query, min_score=MIN_SCORE):
+        """Row of the title that best matches `query`, or None"""
+        matches = self.search(query, 1, min_score)
+        return matches[0][0] if matches else None
+
+
+def build_title_search(movie_index):
+    """Title search over the movies that have not been removed from the catalog"""
+    rows = np.flatnonzero(~movie_index.removed)
+    return TitleSearch([movie_index.title(row) for row in rows], rows)
+
+
+def load_title_search():
+    """Build the title search index once per process"""
+    return get_resource('title_search', lambda: build_title_search(load_movie_index()))
@@ -0,0 +1,172 @@
+"""TMDB metadata fetching for movie cards.
+
+Details come from the prefetched metadata store when the catalog has been
+prefetched (see ``src.prefetch``), then from the persistent metadata cache. Stale entries are
+served immediately and refreshed in the background on a separate small worker
+pool; only cache misses wait on the network, and concurrent misses for the same
+movie share one upstream request.
+
+Card details for a recommendation page are fetched concurrently on a shared,
+bounded worker pool under one overall deadline. Any movie whose fetch fails or
+misses the deadline comes back as None so the caller can fall back to local
+``full_movies`` data via ``local_movie_details``.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from src.metadata_cache import get_cache
+from src.metadata_store import load_metadata_store
+from src.singleflight import SingleFlight
+from src.tmdb_client import MovieNotFound, TMDBUnavailable, get_client
+
+logger = logging.getLogger(__name__)
+
+POSTER_URL = "https://image.tmdb.org/t/p/w500/"
+
+FETCH_DEADLINE = 10
+MAX_WORKERS = 8
+REFRESH_WORKERS = 2
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='tmdb')
+# Stale-entry refreshes get their own small pool so slow refreshes never delay page fetches
+_refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='tmdb-refresh')
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+_in_flight = SingleFlight()
+
+
+def parse_movie_details(data):
+    """Convert a TMDB movie JSON payload into the card details used by the app"""
+    poster_path = data.get('poster_path')
+    return {
+        'poster': POSTER_URL + poster_path if poster_path else None,
+        'rating': data.get('vote_average', 'N/A'),
+        'overview': data.get('overview', 'No description available.'),
+        'release_date': data.get('release_date', 'Unknown'),
+        'genres': [genre['name'] for genre in data.get('genres', [])],
+        'original_language': data.get('original_language'),
+        'popularity': data.get('popularity')
+    }
+
+
+def _fetch_and_cache(movie_id):
+    """Fetch details from TMDB and store them, or the fact that the movie is missing, in the cache"""
+    try:
+        details = parse_movie_details(get_client().get_movie(movie_id))
+    except MovieNotFound:
+        get_cache().put_not_found(movie_id)
+        return None
+    get_cache().put(movie_id, details)
+    return details
+
+
+def _refresh_in_background(movie_id):
+    with _refreshing_lock:
+        if movie_id in _refreshing:
+            return
+        _refreshing.add(movie_id)
+
+    def refresh():
+        try:
+            _in_flight.do(movie_id, _fetch_and_cache, movie_id)
+        except Exception as e:
+            logger.warning("Background refresh of movie %s failed: %s", movie_id, e)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(movie_id)
+
+    _refresh_executor.submit(refresh)
+
+
+def _cached_entry(movie_id):
+    try:
+        return get_cache().get(movie_id)
+    except Exception as e:
+        logger.warning("Metadata cache read failed for %s: %s", movie_id, e)
+        return None
+
+
+def fetch_movie_details(movie_id):
+    """Fetch poster, rating, overview, release date and genres for one movie, or None on failure"""
+    prefetched = load_metadata_store()
+    if movie_id in prefetched:
+        return prefetched[movie_id]
+
+    entry = _cached_entry(movie_id)
+    if entry is not None:
+        if entry.stale:
+            _refresh_in_background(movie_id)
+        return entry.details
+    try:
+        return _in_flight.do(movie_id, _fetch_and_cache, movie_id)
+    except TMDBUnavailable as e:
+        logger.debug("%s", e)
+        return None
+    except Exception as e:
+        logger.warning("Error fetching movie details for %s: %s", movie_id, e)
+        return None
+
+
+def fetch_many(movie_ids, deadline=FETCH_DEADLINE):
+    """Fetch details for every id concurrently, returning a list in input order
+
+    Entries are None for fetches that failed or did not finish within `deadline` seconds.
+    Duplicate ids are fetched once.
+    """
+    prefetched = load_metadata_store()
+    results = {}
+    futures = {}
+    for movie_id in movie_ids:
+        if movie_id in prefetched:
+            results[movie_id] = prefetched[movie_id]
+        elif movie_id not in futures:
+            futures[movie_id] = _executor.submit(fetch_movie_details, movie_id)
+    if not futures:
+        return [results[movie_id] for movie_id in movie_ids]
+
+    done, not_done = wait(futures.values(), timeout=deadline)
+    for future in not_done:
+        future.cancel()
+    if not_done:
+        logger.warning("%d of %d TMDB fetches missed the %ss deadline", len(not_done), len(futures), deadline)
+
+    for movie_id, future in futures.items():
+        if future in done and future.exception() is None:
+            results[movie_id] = future.result()
+    return [results.get(movie_id) for movie_id in movie_ids]
+
+
+def tmdb_available():
+    """False while the TMDB circuit breaker is open and cards are served from local data"""
+    breaker = get_client().breaker
+    return breaker is None or not breaker.is_open
+
+
+def upstream_stats():
+    """Upstream TMDB calls made versus lookups that joined an in-flight call, plus connection reuse"""
+    return {**_in_flight.stats, **get_client().connection_stats()}
+
+
+def local_movie_details(movie_data):
+    """Card details (overview, genres, cast) built from a `full_movies` row, used when TMDB is unavailable"""
+    if movie_data is None:
+        return {
+            'poster': None,
+            'rating': 'N/A',
+            'overview': 'No description available.',
+            'release_date': 'Unknown',
+            'genres': [],
+            'cast': []
+        }
+    overview = movie_data['overview']
+    if isinstance(overview, list):
+        overview = " ".join(overview)
+    return {
+        'poster': None,
+        'rating': 'N/A',
+        'overview': overview,
+        'release_date': 'Unknown',
+        'genres': list(movie_data['genres']),
+        'cast': list(movie_data['cast'])
+    }
@@ -0,0 +1,160 @@
+"""Pooled HTTP client for the TMDB API.
+
+One ``requests.Session`` is shared by every fetch in the process, so TCP and
+TLS connections to api.themoviedb.org are kept alive and reused instead of
+being opened per request. Throttling (429) and server errors (5xx) are retried
+with jittered exponential backoff, honouring ``Retry-After``.
+
+The shared client also goes through a token bucket that keeps the process
+under the TMDB quota and a circuit breaker that fails fast after repeated
+errors, probing the API in the background until it recovers.
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.circuit import CircuitBreaker
+from src.ratelimit import TokenBucket
+
+API_ROOT = "https://api.themoviedb.org/3"
+TMDB_API_KEY = os.environ.get('TMDB_API_KEY', '8265bd1679663a7ea12ac168da84d2e8')
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+POOL_SIZE = 8
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+BACKOFF_JITTER = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+RATE_LIMIT = 20
+RATE_LIMIT_BURST = 40
+RATE_LIMIT_WAIT = 2
+FAILURE_THRESHOLD = 5
+RECOVERY_TIMEOUT = 30
+
+
+class TMDBError(Exception):
+    """A TMDB request failed after retries"""
+
+
+class MovieNotFound(TMDBError):
+    """TMDB has no movie with the requested id"""
+
+
+class TMDBUnavailable(TMDBError):
+    """The request was not sent because the circuit is open or the local rate limit is exhausted"""
+
+
+class TMDBClient:
+    """Keep-alive session with bounded connection pools and retry policy"""
+
+    def __init__(self, api_key=TMDB_API_KEY, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 pool_size=POOL_SIZE, max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR,
+                 backoff_jitter=BACKOFF_JITTER, rate_limiter=None, breaker=None):
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.rate_limiter = rate_limiter
+        self.breaker = breaker
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_jitter,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.params = {'api_key': api_key}
+
+    def get_json(self, path, **params):
+        """GET an API path and return the decoded JSON body, raising TMDBError on failure"""
+        if self.breaker is not None and not self.breaker.allow():
+            raise TMDBUnavailable(f"TMDB circuit is open, not requesting {path}")
+        if self.rate_limiter is not None and not self.rate_limiter.acquire(timeout=RATE_LIMIT_WAIT):
+            raise TMDBUnavailable(f"Local TMDB rate limit exhausted, not requesting {path}")
+        if self.breaker is None:
+            return self._get_json(path, **params)
+
+        try:
+            result = self._get_json(path, **params)
+        except MovieNotFound:
+            self.breaker.record_success()
+            raise
+        except Exception:
+            # Anything else, wrapped in TMDBError or not, counts against the circuit
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def _get_json(self, path, **params):
+        try:
+            response = self.session.get(API_ROOT + path, params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise TMDBError(f"Request to {path} failed: {e}") from e
+        if response.status_code == 404:
+            raise MovieNotFound(f"Not found: {path}")
+        if not response.ok:
+            raise TMDBError(f"Request to {path} returned HTTP {response.status_code}")
+        try:
+            return response.json()
+        except ValueError as e:
+            raise TMDBError(f"Request to {path} returned a body that is not JSON: {e}") from e
+
+    def probe(self):
+        """Cheap request used to check whether TMDB has recovered, bypassing the breaker"""
+        self._get_json("/configuration")
+
+    def get_movie(self, movie_id, language='en-US'):
+        """Raw TMDB movie JSON for `movie_id`"""
+        return self.get_json(f"/movie/{movie_id}", language=language)
+
+    def connection_stats(self):
+        """New versus reused connections across this client's pools
+
+        Every request either opens a new connection or reuses a kept-alive one,
+        so ``reused_connections`` is the number of TCP/TLS handshakes saved.
+        """
+        new_connections = 0
+        total_requests = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                new_connections += pool.num_connections
+                total_requests += pool.num_requests
+        return {
+            'requests': total_requests,
+            'new_connections': new_connections,
+            'reused_connections': max(total_requests - new_connections, 0),
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide TMDB client shared by every session, rate limited and behind a circuit breaker"""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                breaker = CircuitBreaker('tmdb', failure_threshold=FAILURE_THRESHOLD,
+                                         recovery_timeout=RECOVERY_TIMEOUT)
+                client = TMDBClient(rate_limiter=TokenBucket(RATE_LIMIT, capacity=RATE_LIMIT_BURST),
+                                    breaker=breaker)
+                breaker.probe = client.probe
+                _default_client = client
+    return _default_client
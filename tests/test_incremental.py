@@ -0,0 +1,78 @@
+"""Patched neighbor rows must match a full rebuild over the same catalog."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.build import neighbor_block
+from src.incremental import CatalogUpdater
+from src.neighbors import NeighborIndex
+from src.ranking import top_k_rows
+from src.sparse_engine import build_sparse_engine, normalized_features
+
+K = 5
+
+
+def _tags(rng, n_words=6, vocabulary=40):
+    # A small vocabulary makes shared terms, and so exact score ties, common
+    return ' '.join(f"tag{word}" for word in rng.integers(0, vocabulary, n_words))
+
+
+@pytest.fixture
+def updater():
+    rng = np.random.default_rng(0)
+    movies = pd.DataFrame({
+        'movie_id': np.arange(100, 160),
+        'title': [f"Movie {i}" for i in range(60)],
+        'tags': [_tags(rng) for _ in range(60)],
+    })
+    engine = build_sparse_engine(movies['tags'])
+    features = normalized_features(engine.vectorizer.transform(movies['tags']), np.float64)
+    ids, scores = neighbor_block(features, 0, len(movies), K)
+    return CatalogUpdater(movies, engine, NeighborIndex(ids, scores))
+
+
+def _rebuilt(updater):
+    """Top-K rows computed from scratch for the updater's current movies, removed movies ruled out"""
+    matrix = normalized_features(updater.engine.vectorizer.transform(updater.movies['tags']), np.float64)
+    scores = (matrix @ matrix.T).toarray()
+    scores[:, updater.movies['removed'].to_numpy()] = -np.inf
+    return top_k_rows(scores, K, exclude=np.arange(matrix.shape[0]))
+
+
+def _assert_matches_rebuild(updater):
+    ids, scores = _rebuilt(updater)
+    active = ~updater.movies['removed'].to_numpy()
+    np.testing.assert_array_equal(updater.ids[active], ids[active])
+    np.testing.assert_allclose(updater.scores[active], scores[active], rtol=0, atol=1e-6)
+
+
+def test_add_movie_matches_rebuild(updater):
+    updater.add_movie(999, "New Movie", "tag1 tag2 tag3 tag4 tag5")
+    _assert_matches_rebuild(updater)
+
+
+def test_update_movie_matches_rebuild(updater):
+    updater.update_movie(105, tags="tag7 tag7 tag8 tag30")
+    _assert_matches_rebuild(updater)
+
+
+def test_remove_movie_matches_rebuild(updater):
+    row = updater.remove_movie(110)
+    _assert_matches_rebuild(updater)
+    assert not np.any(updater.ids[~updater.movies['removed'].to_numpy()] == row)
+
+
+def test_several_changes_match_rebuild(updater):
+    updater.remove_movie(101)
+    updater.add_movie(998, "Another Movie", "tag3 tag9 tag11")
+    updater.update_movie(120, tags="tag3 tag9 tag12")
+    updater.remove_movie(998)
+    _assert_matches_rebuild(updater)
+
+
+def test_remove_leaving_fewer_than_k_neighbors(updater):
+    for movie_id in range(100, 156):
+        updater.remove_movie(movie_id)
+    _assert_matches_rebuild(updater)
+    active = ~updater.movies['removed'].to_numpy()
+    assert np.all(updater.ids[active][:, 3:] == -1)
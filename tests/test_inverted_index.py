@@ -0,0 +1,80 @@
+"""The inverted index must rank exactly like exhaustive scoring and never return removed movies."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.catalog import MovieIndex
+from src.inverted_index import InvertedIndex, fielded_features
+from src.ranking import TIE_DECIMALS, top_k
+from src.sparse_engine import build_sparse_engine
+
+GENRES = ['Action', 'Adventure', 'Comedy', 'Drama', 'Horror', 'Romance', 'Science Fiction', 'Thriller']
+WORDS = [f"word{i}" for i in range(30)]
+PEOPLE = [f"Person {i}" for i in range(20)]
+
+
+def _pick(rng, values, n):
+    return [str(value) for value in rng.choice(values, n, replace=False)]
+
+
+def _catalog(n=80, removed=()):
+    rng = np.random.default_rng(1)
+    details = pd.DataFrame({
+        'movie_id': np.arange(n),
+        'title': [f"Movie {i}" for i in range(n)],
+        'overview': [' '.join(_pick(rng, WORDS, 5)) for _ in range(n)],
+        'genres': [_pick(rng, GENRES, 2) for _ in range(n)],
+        'keywords': [_pick(rng, WORDS, 3) for _ in range(n)],
+        'cast': [_pick(rng, PEOPLE, 3) for _ in range(n)],
+        'crew': [_pick(rng, PEOPLE, 1) for _ in range(n)],
+        'production_companies': [[] for _ in range(n)],
+    })
+    # Movie 1 is a near copy of movie 0, so it is movie 0's best match until it is removed
+    for field in ('overview', 'genres', 'keywords', 'cast', 'crew'):
+        details.at[1, field] = details.at[0, field]
+
+    def tags(row):
+        return ' '.join([row['overview']] + [' '.join(item.replace(' ', '') for item in row[field])
+                                             for field in ('genres', 'keywords', 'cast', 'crew')]).lower()
+
+    movies = pd.DataFrame({'movie_id': details['movie_id'], 'title': details['title'],
+                           'tags': [tags(row) for _, row in details.iterrows()], 'removed': False})
+    # Removal clears the tags and keeps the full_movies record, like CatalogUpdater.remove_movie
+    for row in removed:
+        movies.at[row, 'tags'] = ''
+        movies.at[row, 'removed'] = True
+    index = MovieIndex(movies, details)
+    return index, build_sparse_engine(movies['tags'])
+
+
+@pytest.mark.parametrize('removed', [(), (1,)])
+def test_matches_exhaustive_search(removed):
+    movie_index, engine = _catalog(removed=removed)
+    features = fielded_features(movie_index, engine)
+    index = InvertedIndex(features)
+    mask = np.arange(len(movie_index)) % 3 != 0
+    for row in range(len(movie_index)):
+        query = features[row].toarray().ravel()
+        # Exhaustive scores in float64, rounded like the index so summation order cannot split ties
+        scores = np.round(features.astype(np.float64) @ query, TIE_DECIMALS)
+        for kwargs in ({'k': 5}, {'k': 5, 'offset': 5}, {'k': 5, 'mask': mask}):
+            true_rows, true_scores = top_k(scores, exclude=row, **kwargs)
+            # Movies sharing no term with the query are not in any posting list the index reads
+            true_rows = true_rows[true_scores > 0]
+            found_rows, _ = index.search(query, exclude=row, **kwargs)
+            np.testing.assert_array_equal(found_rows[:true_rows.size], true_rows)
+
+
+def test_removed_movie_is_never_returned():
+    movie_index, engine = _catalog()
+    index = InvertedIndex(fielded_features(movie_index, engine))
+    query = fielded_features(movie_index, engine)[0].toarray().ravel()
+    assert index.search(query, k=1, exclude=0)[0][0] == 1
+
+    movie_index, engine = _catalog(removed=(1,))
+    features = fielded_features(movie_index, engine)
+    assert features[1].nnz == 0
+    index = InvertedIndex(features)
+    for row in range(len(movie_index)):
+        rows, _ = index.search(features[row].toarray().ravel(), k=len(movie_index), exclude=row)
+        assert 1 not in rows
@@ -0,0 +1,31 @@
+"""Top-k selection keeps the lower-row tie-break and pads rows that cannot fill k places."""
+import numpy as np
+
+from src.ranking import top_k, top_k_rows
+
+
+def test_top_k_breaks_ties_by_lower_row():
+    scores = np.array([0.5, 0.0, 0.5, 0.9, 0.0, 0.5, 0.0])
+    rows, top = top_k(scores, 3)
+    np.testing.assert_array_equal(rows, [3, 0, 2])
+    np.testing.assert_array_equal(top, np.float32([0.9, 0.5, 0.5]))
+    np.testing.assert_array_equal(top_k(scores, 3, offset=3)[0], [5, 1, 4])
+
+
+def test_top_k_rows_matches_top_k_per_row():
+    rng = np.random.default_rng(0)
+    scores = rng.integers(0, 4, (20, 30)) / 4
+    ids, top = top_k_rows(scores, 6, exclude=np.arange(20))
+    for row in range(20):
+        row_ids, row_scores = top_k(scores[row], 6, exclude=row)
+        np.testing.assert_array_equal(ids[row], row_ids)
+        np.testing.assert_array_equal(top[row], row_scores)
+
+
+def test_top_k_rows_pads_rows_with_too_few_finite_scores():
+    scores = np.zeros((3, 10))
+    scores[:, 5:] = -np.inf
+    ids, top = top_k_rows(scores, 7, exclude=[0, 1, 2])
+    np.testing.assert_array_equal(ids[0], [1, 2, 3, 4, -1, -1, -1])
+    np.testing.assert_array_equal(top[0], np.float32([0, 0, 0, 0, -np.inf, -np.inf, -np.inf]))
+    assert np.all((ids >= 0).sum(axis=1) == 4)